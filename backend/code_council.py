@@ -1,11 +1,141 @@
 """Code-specific LLM Council orchestration with iterative refinement."""
 
-import json
+import asyncio
+import io
 import re
+import string
 from typing import List, Dict, Any, Tuple, Optional
 from datetime import datetime
+import orjson
 from .distributed import get_distributed_client
-from .config import get_all_council_models, get_chairman_config, CHAIRMAN_MODEL
+from .config import (
+    get_all_council_models,
+    get_chairman_config,
+    get_chairman_model,
+    MAX_PARALLEL_REFINEMENTS,
+    REFINEMENT_SCORE_THRESHOLD,
+)
+from .prompt_cache import cached_query, query_model_cached, query_models_cached
+
+
+def _is_fence_line(line: str) -> bool:
+    """ Whether a line opens or closes a markdown code fence: ``` plus an optional language tag """
+    line = line.rstrip()
+    return line.startswith('```') and ' ' not in line
+
+
+def _strip_code_fences(text: str) -> str:
+    """ Remove markdown code fence lines and surrounding whitespace from a model response """
+    text = text.strip()
+    if '```' not in text:
+        return text
+    # Fences are not always the first line: models often lead with a sentence
+    return '\n'.join(line for line in text.splitlines() if not _is_fence_line(line)).strip()
+
+
+def _format_code_blocks(blocks: List[Tuple[str, str]]) -> str:
+    """ Render (heading, code) pairs as fenced code blocks in a single buffer """
+    buf = io.StringIO()
+    for i, (heading, code) in enumerate(blocks):
+        if i:
+            buf.write("\n\n")
+        buf.write(heading)
+        buf.write(":\n```\n")
+        buf.write(code)
+        buf.write("\n```")
+    return buf.getvalue()
+
+
+# Anonymized labels for code submissions (Code Submission A, B, C, ...)
+_SUBMISSION_LABELS = string.ascii_uppercase
+
+# Static instructions are sent as system messages so every request in a stage
+# shares an identical prefix that the serving node can reuse from its KV cache.
+_CODE_GENERATION_SYSTEM_PROMPT = """You are an expert software developer. Generate clean, well-structured code based on the specification you are given.
+
+Requirements:
+- Write production-ready code
+- Include proper error handling
+- Add comments where appropriate
+- Follow best practices for the language
+- Make the code maintainable and readable
+
+Provide ONLY the code without any explanations or markdown formatting. Start directly with the code."""
+
+_REVIEW_CATEGORIES = """1. **Bugs**: Actual errors, logic issues, or potential runtime problems
+2. **Style**: Code formatting, naming conventions, consistency
+3. **Performance**: Optimization opportunities, efficiency concerns
+4. **Security**: Vulnerabilities, unsafe practices, security risks
+5. **Best Practices**: Design patterns, maintainability, code organization"""
+
+_REVIEW_FORMAT = """- Bugs: [list any bugs or issues]
+- Style: [style feedback]
+- Performance: [performance feedback]
+- Security: [security feedback]
+- Best Practices: [best practices feedback]
+- Overall Score: [1-10 rating]"""
+
+_REVIEW_SYSTEM_PROMPT = f"""You are a senior code reviewer. Review the code submissions you are given against the original specification.
+
+For each code submission, provide structured feedback in the following categories:
+
+{_REVIEW_CATEGORIES}
+
+Format your response as follows for EACH submission:
+
+Code Submission X:
+{_REVIEW_FORMAT}
+
+Then provide a ranking at the end:
+
+FINAL RANKING:
+1. Code Submission X
+2. Code Submission Y
+3. Code Submission Z"""
+
+_SINGLE_REVIEW_SYSTEM_PROMPT = f"""You are a senior code reviewer. Review the code you are given against the original specification.
+
+Provide structured feedback in the following categories:
+
+{_REVIEW_CATEGORIES}
+
+Format your response as follows:
+
+{_REVIEW_FORMAT}"""
+
+_REFINEMENT_SYSTEM_PROMPT = """You are refining code based on peer review feedback.
+
+Refine the code to address the feedback while maintaining the original functionality. Prioritize:
+1. Fixing bugs and errors
+2. Improving code style and readability
+3. Addressing security concerns
+4. Optimizing performance where appropriate
+5. Following best practices
+
+Provide ONLY the refined code without explanations or markdown formatting."""
+
+_TEST_SYSTEM_PROMPT = """You are a test engineer. Generate comprehensive unit tests for the code you are given.
+
+Requirements:
+- Write comprehensive unit tests
+- Cover edge cases and error scenarios
+- Use appropriate testing framework for the language
+- Include both positive and negative test cases
+- Make tests clear and maintainable
+
+Provide ONLY the test code without explanations or markdown formatting."""
+
+_SYNTHESIS_SYSTEM_PROMPT = """You are the Chairman of the Code Council. Synthesize the best code and tests from multiple submissions.
+
+Your task:
+1. Synthesize the best code by combining the strongest aspects of each submission
+2. Integrate the best test cases into a comprehensive test suite
+3. Ensure the final code is production-ready, well-tested, and follows best practices
+
+Respond with a single JSON object and nothing else:
+{"code": "<the synthesized code>", "tests": "<the synthesized test suite>"}
+
+Do not wrap the code in markdown code blocks."""
 
 
 async def generate_initial_code(
@@ -17,35 +147,22 @@ async def generate_initial_code(
     language_part = f"Programming Language: {language}\n" if language else ""
     framework_part = f"Framework/Library: {framework}\n" if framework else ""
     
-    code_prompt = f"""You are an expert software developer. Generate clean, well-structured code based on the following specification.
-
-{language_part}{framework_part}
-Specification:
-{specification}
-
-Requirements:
-- Write production-ready code
-- Include proper error handling
-- Add comments where appropriate
-- Follow best practices for the language
-- Make the code maintainable and readable
-
-Provide ONLY the code without any explanations or markdown formatting. Start directly with the code."""
+    code_prompt = f"""{language_part}{framework_part}Specification:
+{specification}"""
 
-    messages = [{"role": "user", "content": code_prompt}]
+    messages = [
+        {"role": "system", "content": _CODE_GENERATION_SYSTEM_PROMPT},
+        {"role": "user", "content": code_prompt},
+    ]
     
-    client = get_distributed_client()
     models_config = get_all_council_models()
     
-    responses = await client.query_models_parallel(models_config, messages)
+    responses = await query_models_cached(models_config, messages)
     
     code_results = []
     for model, response in responses.items():
         if response is not None:
-            code_content = response.get('content', '').strip()
-            code_content = re.sub(r'^```[\w]*\n', '', code_content, flags=re.MULTILINE)
-            code_content = re.sub(r'\n```$', '', code_content, flags=re.MULTILINE)
-            code_content = code_content.strip()
+            code_content = _strip_code_fences(response.get('content', ''))
             
             code_results.append({
                 "model": model,
@@ -57,64 +174,50 @@ Provide ONLY the code without any explanations or markdown formatting. Start dir
     return code_results
 
 
+def build_review_prompt_prefix(specification: str) -> str:
+    """ Render the part of the review prompt that is the same for every iteration """
+    return f"""Original Specification:
+{specification}
+
+Code Submissions:
+"""
+
+
 async def review_code_structured(
     code_submissions: List[Dict[str, Any]],
-    specification: str
+    specification: str,
+    prompt_prefix: Optional[str] = None
 ) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
     """ Stage 2: Each model reviews code with structured feedback """
+    if len(code_submissions) <= 1:
+        return await _review_single_submission(code_submissions, specification)
+
     # Create anonymized labels for code submissions
-    labels = [chr(65 + i) for i in range(len(code_submissions))]  # uppercase letters
+    labels = list(_SUBMISSION_LABELS[:len(code_submissions)])
 
     label_to_model = {
         label: submission['model']
         for label, submission in zip(labels, code_submissions)
     }
 
-    code_texts = "\n\n".join([
-        f"Code Submission {label}:\n```\n{submission['code']}\n```"
+    code_texts = _format_code_blocks([
+        (f"Code Submission {label}", submission['code'])
         for label, submission in zip(labels, code_submissions)
     ])
     
-    review_prompt = f"""You are a senior code reviewer. Review the following code submissions against the original specification.
-
-Original Specification:
-{specification}
-
-Code Submissions:
-{code_texts}
-
-For each code submission, provide structured feedback in the following categories:
+    if prompt_prefix is None:
+        prompt_prefix = build_review_prompt_prefix(specification)
+    review_prompt = prompt_prefix + code_texts
 
-1. **Bugs**: Actual errors, logic issues, or potential runtime problems
-2. **Style**: Code formatting, naming conventions, consistency
-3. **Performance**: Optimization opportunities, efficiency concerns
-4. **Security**: Vulnerabilities, unsafe practices, security risks
-5. **Best Practices**: Design patterns, maintainability, code organization
-
-Format your response as follows for EACH submission:
-
-Code Submission X:
-- Bugs: [list any bugs or issues]
-- Style: [style feedback]
-- Performance: [performance feedback]
-- Security: [security feedback]
-- Best Practices: [best practices feedback]
-- Overall Score: [1-10 rating]
-
-Then provide a ranking at the end:
-
-FINAL RANKING:
-1. Code Submission X
-2. Code Submission Y
-3. Code Submission Z"""
-
-    messages = [{"role": "user", "content": review_prompt}]
+    messages = [
+        {"role": "system", "content": _REVIEW_SYSTEM_PROMPT},
+        {"role": "user", "content": review_prompt},
+    ]
     
     # Get reviews from all council models
-    client = get_distributed_client()
     models_config = get_all_council_models()
     
-    responses = await client.query_models_parallel(models_config, messages)
+    responses = await query_models_cached(models_config, messages)
     
     # Parse reviews
     review_results = []
@@ -132,43 +235,118 @@ FINAL RANKING:
 
     return review_results, label_to_model
 
-# TODO
+
+async def _review_single_submission(
+    code_submissions: List[Dict[str, Any]],
+    specification: str
+) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+    """ Review a lone submission without anonymization or ranking """
+    if not code_submissions:
+        return [], {}
+
+    submission = code_submissions[0]
+    review_prompt = f"""Original Specification:
+{specification}
+
+Code:
+```
+{submission['code']}
+```"""
+
+    messages = [
+        {"role": "system", "content": _SINGLE_REVIEW_SYSTEM_PROMPT},
+        {"role": "user", "content": review_prompt},
+    ]
+
+    responses = await query_models_cached(get_all_council_models(), messages)
+
+    review_results = []
+    for model, response in responses.items():
+        if response is not None:
+            review_text = response.get('content', '')
+            review_results.append({
+                "model": model,
+                "review_text": review_text,
+                "parsed_review": {
+                    "submissions": {"A": _parse_submission_review(review_text.splitlines())},
+                    "ranking": ["A"],
+                },
+                "node": response.get('node', 'unknown'),
+            })
+
+    return review_results, {"A": submission['model']}
+
+
+# Review markers, matched line by line so each review is scanned once
+# Headers may carry markdown emphasis or a list number ("2. Code Submission B:")
+_SUBMISSION_HEADER = re.compile(r'^[#*\s]*(?:\d+[.)]\s*)?[*\s]*Code Submission ([A-Z]):\**\s*(.*)$')
+_CATEGORY_LINE = re.compile(r'^[-*]?\s*\**(Bugs|Style|Performance|Security|Best Practices)\**:\**\s*(.*)$')
+_OVERALL_SCORE = re.compile(r'Overall Score:\**\s*(\d+)')
+_RANKING_LABEL = re.compile(r'Code Submission ([A-Z])')
+
+
+def _parse_submission_review(lines: List[str]) -> Dict[str, Any]:
+    """ Parse the category feedback and score out of one submission's review lines """
+    categories: Dict[str, List[str]] = {}
+    current_category = None
+    score = None
+
+    for line in lines:
+        category_match = _CATEGORY_LINE.match(line.strip())
+        if category_match:
+            key = category_match.group(1).lower()
+            # Keep the first occurrence of each category
+            current_category = None if key in categories else key
+            if current_category:
+                categories[key] = [category_match.group(2)]
+            continue
+
+        if score is None:
+            score_match = _OVERALL_SCORE.search(line)
+            if score_match:
+                score = int(score_match.group(1))
+
+        if line.startswith('-'):
+            current_category = None
+        elif current_category:
+            categories[current_category].append(line)
+
+    return {
+        "categories": {key: "\n".join(text).strip() for key, text in categories.items()},
+        "score": score,
+        "full_text": "\n".join(lines).strip()
+    }
+
+
 def parse_structured_review(review_text: str, labels: List[str]) -> Dict[str, Any]:
     """ Parse structured review from LLM response """
     parsed = {
         "submissions": {},
         "ranking": []
     }
-    
-    for label in labels:
-        submission_key = f"Code Submission {label}"
-        if submission_key in review_text:
-            pattern = rf"{re.escape(submission_key)}:(.*?)(?=Code Submission [A-Z]|FINAL RANKING:|$)"
-            match = re.search(pattern, review_text, re.DOTALL)
-            if match:
-                submission_review = match.group(1).strip()
-                
-                categories = {}
-                for category in ["Bugs", "Style", "Performance", "Security", "Best Practices"]:
-                    pattern = rf"{category}:\s*(.*?)(?=\n-|$)"
-                    cat_match = re.search(pattern, submission_review, re.DOTALL)
-                    if cat_match:
-                        categories[category.lower()] = cat_match.group(1).strip()
-                
-                score_match = re.search(r"Overall Score:\s*(\d+)", submission_review)
-                score = int(score_match.group(1)) if score_match else None
-                
-                parsed["submissions"][label] = {
-                    "categories": categories,
-                    "score": score,
-                    "full_text": submission_review
-                }
-    
-    if "FINAL RANKING:" in review_text:
-        ranking_section = review_text.split("FINAL RANKING:")[1]
-        ranking_matches = re.findall(r'Code Submission ([A-Z])', ranking_section)
-        parsed["ranking"] = ranking_matches
-    
+
+    body, marker, ranking_section = review_text.partition("FINAL RANKING:")
+
+    # Split the body into per-submission sections in a single pass
+    wanted = set(labels)
+    sections: Dict[str, List[str]] = {}
+    current_lines = None
+    for line in body.splitlines():
+        header = _SUBMISSION_HEADER.match(line)
+        if header:
+            label = header.group(1)
+            current_lines = None
+            if label in wanted and label not in sections:
+                current_lines = sections[label] = [header.group(2)]
+        elif current_lines is not None:
+            current_lines.append(line)
+
+    for label, lines in sections.items():
+        parsed["submissions"][label] = _parse_submission_review(lines)
+
+    if marker:
+        parsed["ranking"] = _RANKING_LABEL.findall(ranking_section)
+
     return parsed
 
 
@@ -176,7 +354,8 @@ async def refine_code(
     code_submission: Dict[str, Any],
     reviews: List[Dict[str, Any]],
     specification: str,
-    iteration: int
+    iteration: int,
+    submission_label: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Refine code based on review feedback.
@@ -186,22 +365,29 @@ async def refine_code(
         reviews: List of review feedback
         specification: Original specification
         iteration: Current iteration number
+        submission_label: Anonymized label the reviewers used for this submission
     
     Returns:
         Refined code submission dict
     """
     feedback_summary = []
     for review in reviews:
-        parsed = review.get("parsed_review", {})
-        submission_label = None
-        
-        for label, submission_data in parsed.get("submissions", {}).items():
+        submissions = review.get("parsed_review", {}).get("submissions", {})
+        submission_data = submissions.get(submission_label) if submission_label else None
+        if not submission_data:
+            continue
+
+        categories = {k: v for k, v in submission_data.get("categories", {}).items() if v}
+        score = submission_data.get("score")
+        if categories or score is not None:
             feedback_summary.append({
                 "reviewer": review["model"],
-                "categories": submission_data.get("categories", {}),
-                "score": submission_data.get("score"),
+                "categories": categories,
+                "score": score,
             })
-            break
+
+    # Highest-scored reviews first, unscored ones last
+    feedback_summary.sort(key=lambda fb: -1 if fb["score"] is None else fb["score"], reverse=True)
     
     feedback_text = "\n\n".join([
         f"Reviewer: {fb['reviewer']}\n"
@@ -210,44 +396,28 @@ async def refine_code(
         for fb in feedback_summary[:3]  # top 3 reviews
     ])
     
-    refinement_prompt = f"""You are refining code based on peer review feedback.
-
-Original Specification:
+    refinement_prompt = f"""Original Specification:
 {specification}
 
 Original Code:
-```{code_submission['code']}
+```
+{code_submission['code']}
 ```
 
 Review Feedback (Iteration {iteration}):
-{feedback_text}
+{feedback_text}"""
 
-Refine the code to address the feedback while maintaining the original functionality. Prioritize:
-1. Fixing bugs and errors
-2. Improving code style and readability
-3. Addressing security concerns
-4. Optimizing performance where appropriate
-5. Following best practices
-
-Provide ONLY the refined code without explanations or markdown formatting."""
-
-    messages = [{"role": "user", "content": refinement_prompt}]
+    messages = [
+        {"role": "system", "content": _REFINEMENT_SYSTEM_PROMPT},
+        {"role": "user", "content": refinement_prompt},
+    ]
     
-    client = get_distributed_client()
-    response = await client.query_model(
-        model=code_submission['model'],
-        messages=messages,
-        node_url=None
-    )
+    response = await query_model_cached(code_submission['model'], messages)
     
     if response is None:
         return code_submission  # Return original if refinement fails
     
-    refined_code = response.get('content', '').strip()
-    # Remove markdown code blocks if present
-    refined_code = re.sub(r'^```[\w]*\n', '', refined_code, flags=re.MULTILINE)
-    refined_code = re.sub(r'\n```$', '', refined_code, flags=re.MULTILINE)
-    refined_code = refined_code.strip()
+    refined_code = _strip_code_fences(response.get('content', ''))
     
     return {
         **code_submission,
@@ -256,6 +426,60 @@ Provide ONLY the refined code without explanations or markdown formatting."""
     }
 
 
+def _mean_review_scores(reviews: List[Dict[str, Any]]) -> Dict[str, float]:
+    """ Average the overall score each submission label received across reviewers """
+    scores: Dict[str, List[int]] = {}
+    for review in reviews:
+        for label, submission_data in review.get("parsed_review", {}).get("submissions", {}).items():
+            if submission_data.get("score") is not None:
+                scores.setdefault(label, []).append(submission_data["score"])
+    return {label: sum(values) / len(values) for label, values in scores.items()}
+
+
+async def refine_all_code(
+    code_submissions: List[Dict[str, Any]],
+    reviews: List[Dict[str, Any]],
+    label_to_model: Dict[str, str],
+    specification: str,
+    iteration: int
+) -> List[Dict[str, Any]]:
+    """
+    Refine every submission concurrently, bounded by MAX_PARALLEL_REFINEMENTS.
+
+    Submissions whose mean review score already reaches REFINEMENT_SCORE_THRESHOLD
+    are carried over unchanged instead of being sent back to their model.
+
+    Args:
+        code_submissions: Current code submissions
+        reviews: List of review feedback
+        label_to_model: Mapping from anonymized labels to model names used in the reviews,
+            in submission order
+        specification: Original specification
+        iteration: Current iteration number
+
+    Returns:
+        Refined code submissions, in the same order as the input
+    """
+    # Labels were handed out in submission order, so they are matched by
+    # position: two submissions from the same model keep separate feedback
+    labels = list(label_to_model)
+    mean_scores = _mean_review_scores(reviews)
+    semaphore = asyncio.Semaphore(MAX_PARALLEL_REFINEMENTS)
+
+    async def refine_bounded(submission: Dict[str, Any], label: Optional[str]) -> Dict[str, Any]:
+        score = mean_scores.get(label)
+        if score is not None and score >= REFINEMENT_SCORE_THRESHOLD:
+            return submission
+
+        async with semaphore:
+            return await refine_code(submission, reviews, specification, iteration, label)
+
+    return list(await asyncio.gather(*[
+        refine_bounded(sub, labels[i] if i < len(labels) else None)
+        for i, sub in enumerate(code_submissions)
+    ]))
+
+
 async def generate_tests(
     final_code: str,
     specification: str,
@@ -274,39 +498,27 @@ async def generate_tests(
     """
     language_part = f"Programming Language: {language}\n" if language else ""
     
-    test_prompt = f"""You are a test engineer. Generate comprehensive unit tests for the following code.
-
-{language_part}
-Original Specification:
+    test_prompt = f"""{language_part}Original Specification:
 {specification}
 
 Code to Test:
-```{final_code}
 ```
+{final_code}
+```"""
 
-Requirements:
-- Write comprehensive unit tests
-- Cover edge cases and error scenarios
-- Use appropriate testing framework for the language
-- Include both positive and negative test cases
-- Make tests clear and maintainable
-
-Provide ONLY the test code without explanations or markdown formatting."""
-
-    messages = [{"role": "user", "content": test_prompt}]
+    messages = [
+        {"role": "system", "content": _TEST_SYSTEM_PROMPT},
+        {"role": "user", "content": test_prompt},
+    ]
     
-    client = get_distributed_client()
     models_config = get_all_council_models()
     
-    responses = await client.query_models_parallel(models_config, messages)
+    responses = await query_models_cached(models_config, messages)
     
     test_results = []
     for model, response in responses.items():
         if response is not None:
-            test_code = response.get('content', '').strip()
-            test_code = re.sub(r'^```[\w]*\n', '', test_code, flags=re.MULTILINE)
-            test_code = re.sub(r'\n```$', '', test_code, flags=re.MULTILINE)
-            test_code = test_code.strip()
+            test_code = _strip_code_fences(response.get('content', ''))
             
             test_results.append({
                 "model": model,
@@ -317,6 +529,61 @@ Provide ONLY the test code without explanations or markdown formatting."""
     return test_results
 
 
+def _parse_synthesis(synthesis_text: str) -> Tuple[str, str]:
+    """
+    Extract the final code and tests from the chairman's synthesis.
+
+    The chairman is asked for a JSON object; backends that ignore the
+    requested format fall back to the FINAL CODE / FINAL TESTS text layout.
+
+    Returns:
+        Tuple of (final_code, final_tests)
+    """
+    # Models often fence the object or lead with a line of prose, so only the
+    # outermost {...} is handed to the JSON parser
+    body = _strip_code_fences(synthesis_text)
+    start, end = body.find("{"), body.rfind("}")
+    try:
+        data = orjson.loads(body[start:end + 1]) if 0 <= start < end else None
+    except orjson.JSONDecodeError:
+        data = None
+    if isinstance(data, dict):
+        code = data.get("code")
+        tests = data.get("tests")
+        return (
+            _strip_code_fences(code if isinstance(code, str) else ""),
+            _strip_code_fences(tests if isinstance(tests, str) else ""),
+        )
+
+    final_code = ""
+    final_tests = ""
+    _, found, rest = synthesis_text.partition("FINAL CODE:")
+    if found:
+        final_code, _, final_tests = rest.partition("FINAL TESTS:")
+
+    return _strip_code_fences(final_code), _strip_code_fences(final_tests)
+
+
+def _best_submission_code(
+    code_submissions: List[Dict[str, Any]],
+    reviews: List[Dict[str, Any]]
+) -> str:
+    """ Code of the submission with the highest mean review score, the first one if none were scored """
+    if not code_submissions:
+        return ""
+    mean_scores = _mean_review_scores(reviews)
+    scored = [
+        (mean_scores[label], i)
+        for i, label in enumerate(_SUBMISSION_LABELS[:len(code_submissions)])
+        if label in mean_scores
+    ]
+    if not scored:
+        return code_submissions[0]["code"]
+    # Ties go to the earlier submission
+    _, best = max(scored, key=lambda item: (item[0], -item[1]))
+    return code_submissions[best]["code"]
+
+
 async def synthesize_final_code(
     code_submissions: List[Dict[str, Any]],
     reviews: List[Dict[str, Any]],
@@ -335,84 +602,68 @@ async def synthesize_final_code(
     Returns:
         Final synthesized code and tests
     """
-    code_texts = "\n\n".join([
-        f"Code from {sub['model']}:\n```\n{sub['code']}\n```"
+    if len(code_submissions) == 1 and len(tests) <= 1:
+        # Nothing to combine: the lone submission and its tests are the result
+        submission = code_submissions[0]
+        return {
+            "code": submission["code"],
+            "tests": tests[0]["test_code"] if tests else "",
+            "model": submission["model"],
+            "node": submission.get("node", "unknown")
+        }
+
+    code_texts = _format_code_blocks([
+        (f"Code from {sub['model']}", sub['code'])
         for sub in code_submissions
     ])
     
-    test_texts = "\n\n".join([
-        f"Tests from {test['model']}:\n```\n{test['test_code']}\n```"
+    test_texts = _format_code_blocks([
+        (f"Tests from {test['model']}", test['test_code'])
         for test in tests
     ])
     
-    synthesis_prompt = f"""You are the Chairman of the Code Council. Synthesize the best code and tests from multiple submissions.
-
-Original Specification:
+    synthesis_prompt = f"""Original Specification:
 {specification}
 
 Code Submissions:
 {code_texts}
 
 Test Submissions:
-{test_texts}
-
-Your task:
-1. Synthesize the best code by combining the strongest aspects of each submission
-2. Integrate the best test cases into a comprehensive test suite
-3. Ensure the final code is production-ready, well-tested, and follows best practices
-
-Provide your response in the following format:
+{test_texts}"""
 
-FINAL CODE:
-[the synthesized code]
-
-FINAL TESTS:
-[the synthesized test suite]
-
-Do not include markdown code blocks, just the code directly."""
-
-    messages = [{"role": "user", "content": synthesis_prompt}]
+    messages = [
+        {"role": "system", "content": _SYNTHESIS_SYSTEM_PROMPT},
+        {"role": "user", "content": synthesis_prompt},
+    ]
     
     client = get_distributed_client()
-    response = await client.query_chairman(messages)
+    response = await cached_query(
+        get_chairman_model(),
+        messages,
+        lambda: client.query_chairman(messages, response_format="json"),
+        response_format="json",
+    )
     
     if response is None:
         # Fallback: use best code submission
         return {
-            "code": code_submissions[0]["code"] if code_submissions else "",
+            "code": _best_submission_code(code_submissions, reviews),
             "tests": tests[0]["test_code"] if tests else "",
-            "model": CHAIRMAN_MODEL,
+            "model": get_chairman_model(),
             "node": "error"
         }
     
     synthesis_text = response.get('content', '')
-    
-    final_code = ""
-    final_tests = ""
-    
-    if "FINAL CODE:" in synthesis_text:
-        parts = synthesis_text.split("FINAL CODE:")
-        if len(parts) > 1:
-            rest = parts[1]
-            if "FINAL TESTS:" in rest:
-                final_code = rest.split("FINAL TESTS:")[0].strip()
-                final_tests = rest.split("FINAL TESTS:")[1].strip()
-            else:
-                final_code = rest.strip()
-    
-    # Clean up code blocks
-    final_code = re.sub(r'^```[\w]*\n', '', final_code, flags=re.MULTILINE)
-    final_code = re.sub(r'\n```$', '', final_code, flags=re.MULTILINE)
-    final_code = final_code.strip()
-    
-    final_tests = re.sub(r'^```[\w]*\n', '', final_tests, flags=re.MULTILINE)
-    final_tests = re.sub(r'\n```$', '', final_tests, flags=re.MULTILINE)
-    final_tests = final_tests.strip()
-    
+    final_code, final_tests = _parse_synthesis(synthesis_text)
+    if not final_code:
+        # Unparseable synthesis: keep the best refined code rather than nothing
+        final_code = _best_submission_code(code_submissions, reviews)
+        final_tests = final_tests or (tests[0]["test_code"] if tests else "")
+
     return {
         "code": final_code,
         "tests": final_tests,
-        "model": response.get('model', CHAIRMAN_MODEL),
+        "model": response.get('model') or get_chairman_model(),
         "node": response.get('node', 'unknown')
     }
 
@@ -446,44 +697,44 @@ async def run_code_council(
             "tests": []
         }
     
+    # Submission lists are never mutated (refine_all_code builds a new one each
+    # iteration), so each iteration can reference its list without copying
     iterations = [{
         "iteration": 0,
-        "code_submissions": code_submissions.copy(),
+        "code_submissions": code_submissions,
         "reviews": []
     }]
     
     current_submissions = code_submissions
+    review_prefix = build_review_prompt_prefix(specification)
     
     # Iterative refinement
     for iteration_num in range(1, max_iterations + 1):
-        reviews, label_to_model = await review_code_structured(current_submissions, specification)
+        reviews, label_to_model = await review_code_structured(current_submissions, specification, review_prefix)
 
         iterations[-1]["reviews"] = reviews
         iterations[-1]["label_to_model"] = label_to_model
         
-        # Refine each submission
-        refined_submissions = []
-        for submission in current_submissions:
-            refined = await refine_code(submission, reviews, specification, iteration_num)
-            refined_submissions.append(refined)
-        
-        current_submissions = refined_submissions
+        # Refine all submissions in parallel
+        current_submissions = await refine_all_code(
+            current_submissions, reviews, label_to_model, specification, iteration_num
+        )
         
         iterations.append({
             "iteration": iteration_num,
-            "code_submissions": current_submissions.copy(),
+            "code_submissions": current_submissions,
             "reviews": []
         })
     
-    # Final review
-    final_reviews, final_label_to_model = await review_code_structured(current_submissions, specification)
+    # Final review and test generation only depend on the last iteration, so run them together
+    best_code = current_submissions[0]["code"]
+    (final_reviews, final_label_to_model), tests = await asyncio.gather(
+        review_code_structured(current_submissions, specification, review_prefix),
+        generate_tests(best_code, specification, language),
+    )
     iterations[-1]["reviews"] = final_reviews
     iterations[-1]["label_to_model"] = final_label_to_model
     
-    # Generate tests
-    best_code = current_submissions[0]["code"]
-    tests = await generate_tests(best_code, specification, language)
-    
     # Synthesize final code
     final_result = await synthesize_final_code(
         current_submissions,
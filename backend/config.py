@@ -2,25 +2,31 @@
 
 import os
 import json
-from typing import List, Dict, Any, Optional
-from dataclasses import dataclass, field
+import orjson
+from typing import List, Dict, Any, Optional, Tuple
+from dataclasses import dataclass
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class LLMNode:
-    """Represents a remote LLM node in the distributed council."""
+    """
+    Represents a remote LLM node in the distributed council.
+
+    Nodes are immutable: update a node by replacing it with a new instance.
+    """
     name: str                          # Human-readable node name
     host: str                          # Hostname or IP address
     port: int = 8080                   # Node server port (default: 8080)
-    models: List[str] = field(default_factory=list)  # Models available on this node
+    models: Tuple[str, ...] = ()       # Models available on this node
     is_chairman: bool = False          # Whether this node hosts the chairman model
     chairman_model: Optional[str] = None  # Specific model to use as chairman (if is_chairman)
     enabled: bool = True               # Whether this node is active
     timeout: float = 120.0             # Request timeout for this node
     api_key: Optional[str] = None      # API key for node authentication (optional)
+    max_parallel: int = 4              # Max concurrent requests sent to this node
     
     @property
     def url(self) -> str:
@@ -33,12 +39,13 @@ class LLMNode:
             "name": self.name,
             "host": self.host,
             "port": self.port,
-            "models": self.models,
+            "models": list(self.models),
             "is_chairman": self.is_chairman,
             "chairman_model": self.chairman_model,
             "enabled": self.enabled,
             "timeout": self.timeout,
             "api_key": self.api_key,
+            "max_parallel": self.max_parallel,
         }
     
     @classmethod
@@ -48,12 +55,13 @@ class LLMNode:
             name=data["name"],
             host=data["host"],
             port=data.get("port", 8080),
-            models=data.get("models", []),
+            models=tuple(data.get("models", ())),
             is_chairman=data.get("is_chairman", False),
             chairman_model=data.get("chairman_model"),
             enabled=data.get("enabled", True),
             timeout=data.get("timeout", 120.0),
             api_key=data.get("api_key"),
+            max_parallel=data.get("max_parallel", 4),
         )
 
 
@@ -80,20 +88,20 @@ _nodes_json = os.getenv("LLM_COUNCIL_NODES")
 if _nodes_json:
     # Parse nodes from environment variable
     try:
-        _nodes_data = json.loads(_nodes_json)
-        COUNCIL_NODES: List[LLMNode] = [LLMNode.from_dict(n) for n in _nodes_data]
+        _nodes_data = orjson.loads(_nodes_json)
+        _initial_nodes: List[LLMNode] = [LLMNode.from_dict(n) for n in _nodes_data]
     except json.JSONDecodeError as e:
         print(f"Warning: Failed to parse LLM_COUNCIL_NODES: {e}")
-        COUNCIL_NODES = []
+        _initial_nodes = []
 else:
     # Default configuration - single localhost node
     # Changes made via API will only persist for the current session
-    COUNCIL_NODES: List[LLMNode] = [
+    _initial_nodes: List[LLMNode] = [
         LLMNode(
             name="local",
             host="localhost",
             port=8080,  # node_server.py default port
-            models=["gemma3:4b", "mistral"],
+            models=("gemma3:4b", "mistral"),
             is_chairman=True,
             chairman_model="mistral",
             enabled=True,
@@ -102,7 +110,7 @@ else:
             name="Gabin",
             host="172.20.10.4",
             port=8080,
-            models=["gemma3:1b"],
+            models=("gemma3:1b",),
             is_chairman=False,
             enabled=True,
         ),
@@ -110,143 +118,224 @@ else:
             name="Nathan",
             host="10.1.184.150",
             port=8080,
-            models=["llama3.2:1b"],
+            models=("llama3.2:1b",),
             enabled=True,
         ),
         LLMNode(
             name="XPS",
             host="10.1.172.116",
             port=8080,
-            models=["phi3"],
+            models=("phi3",),
             enabled=True,
         ),
     ]
 
+# Nodes indexed by name; this is the source of truth for the node configuration.
+# Insertion order is preserved so the first node still wins the chairman fallback.
+_NODES_BY_NAME: Dict[str, LLMNode] = {node.name: node for node in _initial_nodes}
+del _initial_nodes
+
+
+# Incremented on every node mutation so derived views can be cached safely
+_config_version = 0
+_council_models_cache: Optional[Tuple[int, List[Dict[str, Any]]]] = None
+_chairman_cache: Optional[Tuple[int, Optional[Dict[str, Any]]]] = None
+_enabled_nodes_cache: Optional[Tuple[int, List[LLMNode]]] = None
+_enabled_nodes_by_url_cache: Optional[Tuple[int, Dict[str, LLMNode]]] = None
+
+
+def _bump_config_version() -> None:
+    """Invalidate cached views of the node configuration."""
+    global _config_version
+    _config_version += 1
+
+
+def get_config_version() -> int:
+    """Get a counter that changes whenever the node configuration changes."""
+    return _config_version
+
 
 def get_all_nodes() -> List[LLMNode]:
     """
     Get all nodes (for CRUD operations).
-    Returns the in-memory list of nodes.
+    Returns a snapshot list of the in-memory nodes.
     """
-    return COUNCIL_NODES
+    return list(_NODES_BY_NAME.values())
 
 
 def get_enabled_nodes() -> List[LLMNode]:
-    """Get all enabled nodes."""
-    return [node for node in COUNCIL_NODES if node.enabled]
+    """
+    Get all enabled nodes.
+
+    The result is cached until the node configuration changes and must not
+    be mutated by callers.
+    """
+    global _enabled_nodes_cache
+    if _enabled_nodes_cache is not None and _enabled_nodes_cache[0] == _config_version:
+        return _enabled_nodes_cache[1]
+
+    nodes = [node for node in _NODES_BY_NAME.values() if node.enabled]
+    _enabled_nodes_cache = (_config_version, nodes)
+    return nodes
+
+
+def get_enabled_node_by_url(node_url: str) -> Optional[LLMNode]:
+    """Get the first enabled node served at the given URL, if any."""
+    global _enabled_nodes_by_url_cache
+    if _enabled_nodes_by_url_cache is None or _enabled_nodes_by_url_cache[0] != _config_version:
+        by_url: Dict[str, LLMNode] = {}
+        for node in get_enabled_nodes():
+            by_url.setdefault(node.url, node)
+        _enabled_nodes_by_url_cache = (_config_version, by_url)
+    return _enabled_nodes_by_url_cache[1].get(node_url)
 
 
 def add_node(node: LLMNode) -> None:
     """
-    Add a node to the in-memory list.
+    Add a node to the in-memory configuration.
     Changes are only valid for the current session.
     """
-    global COUNCIL_NODES
-    # Check if node with same name exists
-    if any(n.name == node.name for n in COUNCIL_NODES):
+    if node.name in _NODES_BY_NAME:
         raise ValueError(f"Node with name '{node.name}' already exists")
-    COUNCIL_NODES.append(node)
+    _NODES_BY_NAME[node.name] = node
+    _bump_config_version()
 
 
 def update_node(node_name: str, updated_node: LLMNode) -> None:
     """
-    Update a node in the in-memory list.
+    Update a node in the in-memory configuration.
     Changes are only valid for the current session.
     """
-    global COUNCIL_NODES
-    # Find the node to update
-    node_index = None
-    for i, n in enumerate(COUNCIL_NODES):
-        if n.name == node_name:
-            node_index = i
-            break
-    
-    if node_index is None:
+    global _NODES_BY_NAME
+    if node_name not in _NODES_BY_NAME:
         raise ValueError(f"Node '{node_name}' not found")
-    
-    # Check for name conflicts if name is being changed
-    if updated_node.name != node_name:
-        if any(n.name == updated_node.name for n in COUNCIL_NODES):
+
+    if updated_node.name == node_name:
+        _NODES_BY_NAME[node_name] = updated_node
+    else:
+        # Check for name conflicts if name is being changed
+        if updated_node.name in _NODES_BY_NAME:
             raise ValueError(f"Node with name '{updated_node.name}' already exists")
-    
-    COUNCIL_NODES[node_index] = updated_node
+        # Rebuild the index so the renamed node keeps its position
+        _NODES_BY_NAME = {
+            (updated_node.name if name == node_name else name):
+                (updated_node if name == node_name else node)
+            for name, node in _NODES_BY_NAME.items()
+        }
+    _bump_config_version()
 
 
 def remove_node(node_name: str) -> None:
     """
-    Remove a node from the in-memory list.
+    Remove a node from the in-memory configuration.
     Changes are only valid for the current session.
     """
-    global COUNCIL_NODES
-    original_len = len(COUNCIL_NODES)
-    COUNCIL_NODES = [n for n in COUNCIL_NODES if n.name != node_name]
-    
-    if len(COUNCIL_NODES) == original_len:
+    if _NODES_BY_NAME.pop(node_name, None) is None:
         raise ValueError(f"Node '{node_name}' not found")
+    _bump_config_version()
 
 
 def get_node(node_name: str) -> Optional[LLMNode]:
     """Get a specific node by name."""
-    for node in COUNCIL_NODES:
-        if node.name == node_name:
-            return node
-    return None
+    return _NODES_BY_NAME.get(node_name)
 
 
 def get_all_council_models() -> List[Dict[str, Any]]:
     """
     Get all council models across all enabled nodes.
     
+    The result is cached until the node configuration changes and must not
+    be mutated by callers.
+
     Returns:
         List of dicts with 'model', 'node_name', 'node_url' keys
     """
-    models = []
-    for node in get_enabled_nodes():
-        for model in node.models:
-            models.append({
-                "model": model,
-                "node_name": node.name,
-                "node_url": node.url,
-                "timeout": node.timeout,
-            })
+    global _council_models_cache
+    if _council_models_cache is not None and _council_models_cache[0] == _config_version:
+        return _council_models_cache[1]
+
+    models = [
+        {
+            "model": model,
+            "node_name": node.name,
+            "node_url": node.url,
+            "timeout": node.timeout,
+        }
+        for node in get_enabled_nodes()
+        for model in node.models
+    ]
+
+    _council_models_cache = (_config_version, models)
     return models
 
 
 def get_chairman_config() -> Optional[Dict[str, Any]]:
     """
     Get the chairman model configuration.
+
+    The result is cached until the node configuration changes.
     
     Returns:
         Dict with 'model', 'node_name', 'node_url' keys, or None if no chairman configured
     """
+    global _chairman_cache
+    if _chairman_cache is not None and _chairman_cache[0] == _config_version:
+        return _chairman_cache[1]
+
+    chairman = None
     for node in get_enabled_nodes():
         if node.is_chairman and node.chairman_model:
-            return {
+            chairman = {
                 "model": node.chairman_model,
                 "node_name": node.name,
                 "node_url": node.url,
                 "timeout": node.timeout,
             }
+            break
     
     # Fallback: use first model from first node as chairman
-    models = get_all_council_models()
-    if models:
-        return models[0]
-    
-    return None
+    if chairman is None:
+        models = get_all_council_models()
+        if models:
+            chairman = models[0]
+
+    _chairman_cache = (_config_version, chairman)
+    return chairman
 
 
 # =============================================================================
 # LEGACY COMPATIBILITY
 # =============================================================================
-# These are kept for backward compatibility with non-distributed code
+# These are kept for backward compatibility with non-distributed code.
+# COUNCIL_NODES, COUNCIL_MODELS and CHAIRMAN_MODEL are resolved lazily through __getattr__ so
+# they are not computed at import time and always reflect the current nodes.
 
-# Build COUNCIL_MODELS list from all nodes
-COUNCIL_MODELS = [m["model"] for m in get_all_council_models()]
+def get_council_model_names() -> List[str]:
+    """Get the names of all council models across enabled nodes."""
+    return [m["model"] for m in get_all_council_models()]
 
-# Get chairman model
-_chairman = get_chairman_config()
-CHAIRMAN_MODEL = _chairman["model"] if _chairman else "mistral"
+
+def get_chairman_model() -> str:
+    """Get the chairman model name, falling back to 'mistral' if none is configured."""
+    chairman = get_chairman_config()
+    return chairman["model"] if chairman else "mistral"
+
+
+def __getattr__(name: str) -> Any:
+    if name == "COUNCIL_NODES":
+        return get_all_nodes()
+    if name == "COUNCIL_MODELS":
+        return get_council_model_names()
+    if name == "CHAIRMAN_MODEL":
+        return get_chairman_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Ollama server used by the single-machine client in backend/ollama.py
+OLLAMA_API_URL = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+
+# Maximum concurrent requests sent to that server; match its OLLAMA_NUM_PARALLEL
+OLLAMA_MAX_CONCURRENT = int(os.getenv("OLLAMA_MAX_CONCURRENT", "4"))
 
 # Data directory for conversation storage
 DATA_DIR = "data/conversations"
@@ -259,11 +348,68 @@ DATA_DIR = "data/conversations"
 # Health check interval (seconds) - how often to check node availability
 HEALTH_CHECK_INTERVAL = int(os.getenv("HEALTH_CHECK_INTERVAL", "30"))
 
+# Upper bound (seconds) on a single node's health check
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "5.0"))
+
+# After this many consecutive failures a node is re-probed with exponential
+# backoff (starting at HEALTH_CHECK_INTERVAL, capped at HEALTH_CHECK_MAX_BACKOFF)
+HEALTH_CHECK_BACKOFF_AFTER = int(os.getenv("HEALTH_CHECK_BACKOFF_AFTER", "3"))
+HEALTH_CHECK_MAX_BACKOFF = float(os.getenv("HEALTH_CHECK_MAX_BACKOFF", "300"))
+
+# Nodes checked less than this many seconds ago reuse their last result
+HEALTH_CHECK_CACHE_TTL = float(os.getenv("HEALTH_CHECK_CACHE_TTL", "5"))
+
+# Maximum number of node health checks in flight at once
+HEALTH_CHECK_CONCURRENCY = int(os.getenv("HEALTH_CHECK_CONCURRENCY", "16"))
+
 # Maximum retries for failed requests
 MAX_RETRIES = int(os.getenv("MAX_RETRIES", "2"))
 
 # Retry delay (seconds)
 RETRY_DELAY = float(os.getenv("RETRY_DELAY", "1.0"))
 
+# Retries back off exponentially from RETRY_DELAY up to this many seconds
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "10.0"))
+
+# After this many consecutive failed queries a node is skipped (and its models
+# failed over to other nodes when possible) for CIRCUIT_BREAKER_COOLDOWN seconds
+CIRCUIT_BREAKER_THRESHOLD = int(os.getenv("CIRCUIT_BREAKER_THRESHOLD", "3"))
+CIRCUIT_BREAKER_COOLDOWN = float(os.getenv("CIRCUIT_BREAKER_COOLDOWN", "30"))
+
+# How long idle connections to nodes are kept open for reuse (seconds)
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+
+# Maximum number of refinement requests in flight at once during code council iterations
+MAX_PARALLEL_REFINEMENTS = int(os.getenv("MAX_PARALLEL_REFINEMENTS", "4"))
+
+# Submissions whose mean review score reaches this value skip further refinement
+REFINEMENT_SCORE_THRESHOLD = float(os.getenv("REFINEMENT_SCORE_THRESHOLD", "9"))
+
+# Fraction of Stage 1 responses that must arrive before Stage 2 ranking starts
+# in the streaming endpoint; late responses are still shown but not ranked.
+# 1.0 waits for every model.
+STAGE1_QUORUM = float(os.getenv("STAGE1_QUORUM", "1.0"))
+
+# Seconds without an event after which a stream sends an SSE comment so
+# proxies keep the connection open during long stages; 0 disables
+SSE_KEEPALIVE_INTERVAL = float(os.getenv("SSE_KEEPALIVE_INTERVAL", "15"))
+
+# Reuse responses for identical prompts sent to the same model (off by default)
+PROMPT_CACHE_ENABLED = os.getenv("COUNCIL_PROMPT_CACHE", "0") == "1"
+
+# Maximum number of cached prompt responses and their lifetime (seconds)
+PROMPT_CACHE_SIZE = int(os.getenv("PROMPT_CACHE_SIZE", "512"))
+PROMPT_CACHE_TTL = float(os.getenv("PROMPT_CACHE_TTL", "1800"))
+
+# Coalesce chat requests to the same node that arrive within this window (ms)
+# into one POST /chat/batch; 0 disables batching. Nodes without the batch
+# endpoint are detected and served with individual requests.
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "0"))
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))
+
+# Number of recent (model, prompt prefix) -> node routing decisions remembered
+# so repeated prompts go to the node that already has the prefix cached
+PREFIX_AFFINITY_SIZE = int(os.getenv("PREFIX_AFFINITY_SIZE", "256"))
+
 # Enable verbose logging for distributed operations
 DISTRIBUTED_DEBUG = os.getenv("DISTRIBUTED_DEBUG", "true").lower() == "true"
@@ -1,8 +1,10 @@
 """3-stage LLM Council orchestration."""
 
-from typing import List, Dict, Any, Tuple
-from .distributed import query_models_parallel, query_model, get_distributed_client
-from .config import COUNCIL_MODELS, CHAIRMAN_MODEL, get_all_council_models
+from contextlib import aclosing
+from typing import AsyncIterator, List, Dict, Any, Tuple
+from .distributed import get_distributed_client
+from .config import get_all_council_models, get_chairman_model
+from .prompt_cache import cached_query, query_model_cached, query_models_cached, stream_models_cached
 
 
 async def stage1_collect_responses(user_query: str) -> List[Dict[str, Any]]:
@@ -17,11 +19,8 @@ async def stage1_collect_responses(user_query: str) -> List[Dict[str, Any]]:
     """
     messages = [{"role": "user", "content": user_query}]
 
-    # Get the distributed client and query all models in parallel
-    client = get_distributed_client()
-    models_config = get_all_council_models()
-    
-    responses = await client.query_models_parallel(models_config, messages)
+    # Query all models in parallel across the distributed nodes
+    responses = await query_models_cached(get_all_council_models(), messages)
 
     # Format results
     stage1_results = []
@@ -36,6 +35,39 @@ async def stage1_collect_responses(user_query: str) -> List[Dict[str, Any]]:
     return stage1_results
 
 
+async def stage1_stream_responses(user_query: str) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Stage 1, streamed: yield tokens as the council models generate them and
+    each model's full response as soon as it finishes.
+
+    Args:
+        user_query: The user's question
+
+    Yields:
+        ('token', {'model', 'content'}) for each new piece of text, and
+        ('response', {'model', 'response', 'node'}) once a model is done,
+        in completion order. Models that fail yield no response
+    """
+    messages = [{"role": "user", "content": user_query}]
+
+    parts: Dict[str, List[str]] = {}
+    async with aclosing(stream_models_cached(get_all_council_models(), messages)) as chunks:
+        async for model, chunk in chunks:
+            if chunk is None:  # Only include successful responses
+                parts.pop(model, None)
+                continue
+            parts.setdefault(model, []).append(chunk['content'])
+            if not chunk['done']:
+                if chunk['content']:
+                    yield 'token', {"model": model, "content": chunk['content']}
+                continue
+            yield 'response', {
+                "model": model,
+                "response": ''.join(parts.pop(model)),
+                "node": chunk.get('node', 'unknown'),
+            }
+
+
 async def stage2_collect_rankings(
     user_query: str,
     stage1_results: List[Dict[str, Any]]
@@ -99,7 +131,7 @@ Now provide your evaluation and ranking:"""
     messages = [{"role": "user", "content": ranking_prompt}]
 
     # Get rankings from all council models in parallel
-    responses = await query_models_parallel(COUNCIL_MODELS, messages)
+    responses = await query_models_cached(get_all_council_models(), messages)
 
     # Format results
     stage2_results = []
@@ -164,18 +196,18 @@ Provide a clear, well-reasoned final answer that represents the council's collec
 
     # Query the chairman model via the distributed client
     client = get_distributed_client()
-    response = await client.query_chairman(messages)
+    response = await cached_query(get_chairman_model(), messages, lambda: client.query_chairman(messages))
 
     if response is None:
         # Fallback if chairman fails
         return {
-            "model": CHAIRMAN_MODEL,
+            "model": get_chairman_model(),
             "response": "Error: Unable to generate final synthesis.",
             "node": "error"
         }
 
     return {
-        "model": response.get('model', CHAIRMAN_MODEL),
+        "model": response.get('model') or get_chairman_model(),
         "response": response.get('content', ''),
         "node": response.get('node', 'unknown')
     }
@@ -229,32 +261,31 @@ def calculate_aggregate_rankings(
     Returns:
         List of dicts with model name and average rank, sorted best to worst
     """
-    from collections import defaultdict
-
-    # Track positions for each model
-    model_positions = defaultdict(list)
+    # Running (sum of positions, count) for each model
+    totals: Dict[str, List[int]] = {}
 
     for ranking in stage2_results:
-        ranking_text = ranking['ranking']
-
-        # Parse the ranking from the structured format
-        parsed_ranking = parse_ranking_from_text(ranking_text)
+        # Stage 2 already parsed each ranking; only parse results that lack it
+        parsed_ranking = ranking.get('parsed_ranking')
+        if parsed_ranking is None:
+            parsed_ranking = parse_ranking_from_text(ranking['ranking'])
 
         for position, label in enumerate(parsed_ranking, start=1):
-            if label in label_to_model:
-                model_name = label_to_model[label]
-                model_positions[model_name].append(position)
+            model_name = label_to_model.get(label)
+            if model_name is not None:
+                total = totals.setdefault(model_name, [0, 0])
+                total[0] += position
+                total[1] += 1
 
     # Calculate average position for each model
-    aggregate = []
-    for model, positions in model_positions.items():
-        if positions:
-            avg_rank = sum(positions) / len(positions)
-            aggregate.append({
-                "model": model,
-                "average_rank": round(avg_rank, 2),
-                "rankings_count": len(positions)
-            })
+    aggregate = [
+        {
+            "model": model,
+            "average_rank": round(position_sum / count, 2),
+            "rankings_count": count
+        }
+        for model, (position_sum, count) in totals.items()
+    ]
 
     # Sort by average rank (lower is better)
     aggregate.sort(key=lambda x: x['average_rank'])
@@ -282,7 +313,7 @@ Title:"""
     messages = [{"role": "user", "content": title_prompt}]
 
     # Use the chairman model for title generation
-    response = await query_model(CHAIRMAN_MODEL, messages, timeout=30.0)
+    response = await query_model_cached(get_chairman_model(), messages, timeout=30.0)
 
     if response is None:
         # Fallback to a generic title
@@ -6,32 +6,222 @@ running on different machines, enabling a distributed LLM council.
 """
 
 import asyncio
+import logging
 import httpx
-from typing import List, Dict, Any, Optional, Tuple
+import orjson
+import random
+import socket
+from collections import OrderedDict
+from contextlib import AsyncExitStack
+from typing import AsyncIterator, List, Dict, Any, Optional, Set, Tuple, Union
 from dataclasses import dataclass, field
-from datetime import datetime, timedelta
+import time
+from datetime import datetime
 
 from .config import (
     LLMNode,
     get_enabled_nodes,
+    get_enabled_node_by_url,
     get_all_council_models,
     get_chairman_config,
+    get_config_version,
+    HEALTH_CHECK_INTERVAL,
+    HEALTH_CHECK_TIMEOUT,
+    HEALTH_CHECK_BACKOFF_AFTER,
+    HEALTH_CHECK_MAX_BACKOFF,
+    HEALTH_CHECK_CACHE_TTL,
+    HEALTH_CHECK_CONCURRENCY,
     MAX_RETRIES,
     RETRY_DELAY,
-    DISTRIBUTED_DEBUG,
+    RETRY_MAX_DELAY,
+    CIRCUIT_BREAKER_THRESHOLD,
+    CIRCUIT_BREAKER_COOLDOWN,
+    PREFIX_AFFINITY_SIZE,
+    BATCH_WINDOW_MS,
+    BATCH_MAX_SIZE,
+    HTTP_KEEPALIVE_EXPIRY,
 )
 
+logger = logging.getLogger(__name__)
 
-@dataclass
+
+# Request bodies are encoded with orjson and sent as raw content, so the
+# content type that httpx would set for json= has to be given explicitly
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+# Connection pool limits for each node's HTTP client. Model calls routinely take
+# longer than httpx's default 5s keep-alive expiry, which would otherwise drop
+# the idle connection between council stages and force a new handshake.
+NODE_POOL_LIMITS = httpx.Limits(
+    max_connections=32,
+    max_keepalive_connections=16,
+    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+)
+
+# Socket options for node connections: send small chat requests immediately and
+# use TCP keep-alive so a silently dead peer is noticed during long generations
+NODE_SOCKET_OPTIONS = [
+    (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+    (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+]
+if hasattr(socket, "TCP_KEEPIDLE"):
+    # Linux only: probe after 30s idle, every 10s, give up after 3 misses
+    NODE_SOCKET_OPTIONS += [
+        (socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 30),
+        (socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 10),
+        (socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3),
+    ]
+if hasattr(socket, "TCP_USER_TIMEOUT"):
+    # Linux only: drop the connection if sent data goes unacknowledged for 30s
+    NODE_SOCKET_OPTIONS.append((socket.IPPROTO_TCP, socket.TCP_USER_TIMEOUT, 30_000))
+
+
+def _node_transport() -> httpx.AsyncHTTPTransport:
+    """Build the connection pool transport for a node client."""
+    return httpx.AsyncHTTPTransport(
+        limits=NODE_POOL_LIMITS,
+        socket_options=NODE_SOCKET_OPTIONS,
+    )
+
+
+@dataclass(slots=True)
 class NodeHealth:
     """Tracks the health status of a node."""
     node_name: str
     is_healthy: bool = True
-    last_check: datetime = field(default_factory=datetime.now)
+    last_check_monotonic: float = field(default_factory=time.monotonic)  # For interval math
+    last_check_wall: float = field(default_factory=time.time)  # For display only
     last_error: Optional[str] = None
     consecutive_failures: int = 0
     available_models: List[str] = field(default_factory=list)
 
+    def mark_checked(self) -> None:
+        """Record that the node was just checked."""
+        self.last_check_monotonic = time.monotonic()
+        self.last_check_wall = time.time()
+
+    @property
+    def last_check(self) -> datetime:
+        """Wall-clock time of the last check, built only when serializing."""
+        return datetime.fromtimestamp(self.last_check_wall)
+
+
+@dataclass(slots=True)
+class _InFlightRequest:
+    """A chat request shared by identical concurrent callers."""
+    task: "asyncio.Future[Optional[Dict[str, Any]]]"
+    waiters: int = 0
+
+
+class _BatchedChatError(Exception):
+    """A failed entry of a /chat/batch reply, with the HTTP status /chat would have given it."""
+
+    def __init__(self, message: str, status_code: Optional[int]):
+        super().__init__(message)
+        # None for nodes that predate per-entry statuses
+        self.status_code = status_code
+
+
+class _ChatBatcher:
+    """
+    Coalesces concurrent chat requests to one node into a single /chat/batch call.
+
+    Requests are collected for up to `window` seconds (or until `max_size` are
+    waiting) and sent together. If the node does not implement /chat/batch,
+    the batcher falls back to individual /chat requests from then on.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, window: float, max_size: int):
+        self.client = client
+        self._window = window
+        self._max_size = max(1, max_size)
+        self._pending: List[Tuple[Dict[str, Any], httpx.Timeout, "asyncio.Future[Dict[str, Any]]"]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._batch_supported = True
+        # The event loop only keeps weak references to tasks, so in-flight
+        # sends are held here until they finish
+        self._send_tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, payload: Dict[str, Any], timeout: httpx.Timeout) -> Dict[str, Any]:
+        """Queue a chat request and wait for its decoded /chat response body."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((payload, timeout, future))
+
+        if len(self._pending) >= self._max_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self._window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._send(batch))
+            self._send_tasks.add(task)
+            task.add_done_callback(self._send_tasks.discard)
+
+    async def _send(self, batch) -> None:
+        if len(batch) > 1 and self._batch_supported:
+            try:
+                results = await self._send_batch(batch)
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            if results is not None:
+                for (_, _, future), result in zip(batch, results):
+                    if future.done():
+                        continue
+                    if "error" in result:
+                        future.set_exception(_BatchedChatError(
+                            f"Batched chat failed: {result['error']}", result.get("status")
+                        ))
+                    else:
+                        future.set_result(result)
+                return
+
+        await asyncio.gather(*(self._send_one(payload, timeout, future) for payload, timeout, future in batch))
+
+    async def _send_batch(self, batch) -> Optional[List[Dict[str, Any]]]:
+        """Send a batch; returns None if the node has no batch endpoint."""
+        # The batch is only as fast as its slowest request, so use the longest read timeout
+        timeout = max((t for _, t, _ in batch), key=lambda t: t.read or 0)
+        response = await self.client.post(
+            "/chat/batch",
+            content=orjson.dumps({"requests": [payload for payload, _, _ in batch]}),
+            headers=_JSON_HEADERS,
+            timeout=timeout,
+        )
+        if response.status_code in (404, 405):
+            logger.debug("Node at %s has no /chat/batch endpoint, sending requests individually", self.client.base_url)
+            self._batch_supported = False
+            return None
+        response.raise_for_status()
+        results = orjson.loads(response.content)["responses"]
+        if len(results) != len(batch):
+            raise RuntimeError(f"Batched chat returned {len(results)} responses for {len(batch)} requests")
+        return results
+
+    async def _send_one(self, payload, timeout, future) -> None:
+        try:
+            response = await self.client.post(
+                "/chat", content=orjson.dumps(payload), headers=_JSON_HEADERS, timeout=timeout
+            )
+            response.raise_for_status()
+            result = orjson.loads(response.content)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        else:
+            if not future.done():
+                future.set_result(result)
+
 
 class DistributedLLMClient:
     """
@@ -48,10 +238,44 @@ class DistributedLLMClient:
     def __init__(self):
         self._node_health: Dict[str, NodeHealth] = {}
         self._http_clients: Dict[str, httpx.AsyncClient] = {}
+        # Node config each cached client was built from, to detect edits
+        self._client_nodes: Dict[str, LLMNode] = {}
+        # Shared clients for node URLs that are not in the node configuration
+        self._url_clients: Dict[str, httpx.AsyncClient] = {}
+        # Clients replaced after a node edit, closed on the next health sweep
+        self._retired_clients: List[httpx.AsyncClient] = []
+        # Per-node (limit, semaphore) capping concurrent requests to each node
+        self._node_semaphores: Dict[str, Tuple[int, asyncio.Semaphore]] = {}
+        # Base model name -> nodes serving it, rebuilt when config or health changes
+        self._routing_index: Dict[str, List[LLMNode]] = {}
+        # (model base, leading-message hash) -> node that last served it, LRU ordered
+        self._prefix_affinity: "OrderedDict[Tuple[str, int], str]" = OrderedDict()
+        # (node, model, request hash) -> in-flight chat request shared by identical callers
+        self._inflight: Dict[Tuple[str, str, int], _InFlightRequest] = {}
+        # Node name (or URL) -> (consecutive query failures, monotonic time of last failure)
+        self._query_failures: Dict[str, Tuple[int, float]] = {}
+        # Node name (or URL) -> request batcher, used when BATCH_WINDOW_MS > 0
+        self._batchers: Dict[str, _ChatBatcher] = {}
+        # Periodic health check task started by start_background_tasks()
+        self._bg_task: Optional[asyncio.Task] = None
+        self._routing_key: Optional[Tuple[int, int]] = None
+        self._healthy_nodes: List[LLMNode] = []
+        self._healthy_nodes_key: Optional[Tuple[int, int]] = None
+        self._health_version = 0
         self._initialized = False
 
     def _get_client_for_node(self, node: LLMNode) -> httpx.AsyncClient:
         """Get or create an HTTP client for a specific node."""
+        cached_node = self._client_nodes.get(node.name)
+        if cached_node is not None and (
+            cached_node.url != node.url
+            or cached_node.api_key != node.api_key
+            or cached_node.timeout != node.timeout
+        ):
+            # Node was edited; the old client points at stale settings
+            self._retired_clients.append(self._http_clients.pop(node.name))
+            del self._client_nodes[node.name]
+
         if node.name not in self._http_clients:
             headers = {}
             if node.api_key:
@@ -70,13 +294,31 @@ class DistributedLLMClient:
                 base_url=node.url,
                 headers=headers,
                 timeout=timeout,
+                transport=_node_transport(),
             )
+            self._client_nodes[node.name] = node
 
-            if DISTRIBUTED_DEBUG:
-                print(f"[Distributed] Created HTTP client for node '{node.name}' at {node.url}")
+            logger.debug("Created HTTP client for node '%s' at %s", node.name, node.url)
 
         return self._http_clients[node.name]
 
+    def _get_client_for_url(self, node_url: str) -> httpx.AsyncClient:
+        """Get or create a shared HTTP client for an unconfigured node URL."""
+        client = self._url_clients.get(node_url)
+        if client is None:
+            client = httpx.AsyncClient(base_url=node_url, transport=_node_transport())
+            self._url_clients[node_url] = client
+        return client
+
+    def _get_semaphore_for_node(self, node: LLMNode) -> asyncio.Semaphore:
+        """Get the semaphore limiting concurrent requests to a node."""
+        limit = max(1, node.max_parallel)
+        entry = self._node_semaphores.get(node.name)
+        if entry is None or entry[0] != limit:
+            entry = (limit, asyncio.Semaphore(limit))
+            self._node_semaphores[node.name] = entry
+        return entry[1]
+
     async def check_node_health(self, node: LLMNode) -> NodeHealth:
         """
         Check if a node is healthy and what models it has available.
@@ -92,41 +334,35 @@ class DistributedLLMClient:
         try:
             client = self._get_client_for_node(node)
 
-            # Call the /health endpoint with a short timeout (10 seconds total)
+            # Call the /health endpoint with a short timeout
             # This prevents health checks from hanging on unreachable nodes
-            health_timeout = httpx.Timeout(
-                connect=5.0,  # 5 seconds to connect for health checks
-                read=5.0,     # 5 seconds to read response
-                write=5.0,
-                pool=2.0,
-            )
+            health_timeout = httpx.Timeout(HEALTH_CHECK_TIMEOUT, pool=2.0)
             response = await client.get("/health", timeout=health_timeout)
             response.raise_for_status()
 
-            data = response.json()
+            data = orjson.loads(response.content)
 
             # Extract available models from health response
             available_models = data.get("available_models", data.get("advertised_models", []))
 
             health.is_healthy = data.get("status") == "ok"
-            health.last_check = datetime.now()
+            health.mark_checked()
             health.last_error = None
             health.consecutive_failures = 0
             health.available_models = available_models
 
-            if DISTRIBUTED_DEBUG:
-                print(f"[Distributed] Node '{node.name}' is healthy. Models: {available_models}")
+            logger.debug("Node '%s' is healthy. Models: %s", node.name, available_models)
 
         except Exception as e:
             health.is_healthy = False
-            health.last_check = datetime.now()
+            health.mark_checked()
             health.last_error = str(e)
             health.consecutive_failures += 1
 
-            if DISTRIBUTED_DEBUG:
-                print(f"[Distributed] Node '{node.name}' health check failed: {e}")
+            logger.debug("Node '%s' health check failed: %s", node.name, e)
 
         self._node_health[node.name] = health
+        self._health_version += 1
         return health
 
     async def check_all_nodes_health(self) -> Dict[str, NodeHealth]:
@@ -142,18 +378,43 @@ class DistributedLLMClient:
             del self._node_health[stale_node]
             # Also close and remove HTTP client for deleted node
             if stale_node in self._http_clients:
-                await self._http_clients[stale_node].aclose()
-                del self._http_clients[stale_node]
-            if DISTRIBUTED_DEBUG:
-                print(f"[Distributed] Removed stale health data for deleted node '{stale_node}'")
+                await self._http_clients.pop(stale_node).aclose()
+                self._client_nodes.pop(stale_node, None)
+            self._node_semaphores.pop(stale_node, None)
+            self._batchers.pop(stale_node, None)
+            logger.debug("Removed stale health data for deleted node '%s'", stale_node)
 
-        # Check all nodes in parallel
-        tasks = [self.check_node_health(node) for node in nodes]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        await self._close_retired_clients()
+
+        # Nodes checked moments ago keep their result, and repeatedly failing
+        # nodes are only re-probed once their backoff expires
+        nodes = [
+            node for node in nodes
+            if not self._recently_checked(node.name) and not self._in_health_backoff(node.name)
+        ]
+
+        # Check nodes in parallel, a bounded number at a time; each check has its
+        # own timeout (not counting time spent queued) so one hung node cannot
+        # stall the rest
+        semaphore = asyncio.Semaphore(HEALTH_CHECK_CONCURRENCY)
+
+        async def check_bounded(node: LLMNode) -> NodeHealth:
+            async with semaphore:
+                return await asyncio.wait_for(self.check_node_health(node), timeout=HEALTH_CHECK_TIMEOUT)
+
+        results = await asyncio.gather(*(check_bounded(node) for node in nodes), return_exceptions=True)
 
         # Update health dict
         for node, result in zip(nodes, results):
-            if isinstance(result, Exception):
+            if isinstance(result, asyncio.TimeoutError):
+                health = self._node_health.get(node.name, NodeHealth(node_name=node.name))
+                health.is_healthy = False
+                health.mark_checked()
+                health.last_error = "timeout"
+                health.consecutive_failures += 1
+                self._node_health[node.name] = health
+                logger.debug("Node '%s' health check timed out", node.name)
+            elif isinstance(result, Exception):
                 self._node_health[node.name] = NodeHealth(
                     node_name=node.name,
                     is_healthy=False,
@@ -162,47 +423,132 @@ class DistributedLLMClient:
                 )
             elif isinstance(result, NodeHealth):
                 self._node_health[node.name] = result
+        self._health_version += 1
 
         return self._node_health.copy()
 
+    def _recently_checked(self, node_name: str) -> bool:
+        """Whether a node's last health check is recent enough to reuse."""
+        health = self._node_health.get(node_name)
+        return health is not None and time.monotonic() - health.last_check_monotonic < HEALTH_CHECK_CACHE_TTL
+
+    def _in_health_backoff(self, node_name: str) -> bool:
+        """Whether a repeatedly failing node should skip this health check round."""
+        health = self._node_health.get(node_name)
+        if health is None or health.consecutive_failures < HEALTH_CHECK_BACKOFF_AFTER:
+            return False
+        exponent = health.consecutive_failures - HEALTH_CHECK_BACKOFF_AFTER
+        backoff = min(HEALTH_CHECK_INTERVAL * 2 ** exponent, HEALTH_CHECK_MAX_BACKOFF)
+        return time.monotonic() - health.last_check_monotonic < backoff
+
     def get_healthy_nodes(self) -> List[LLMNode]:
-        """Get list of currently healthy nodes."""
-        healthy = []
-        for node in get_enabled_nodes():
-            health = self._node_health.get(node.name)
-            if health is None or health.is_healthy:
-                healthy.append(node)
-        return healthy
+        """
+        Get list of currently healthy nodes.
+
+        The result is cached until the node configuration or health state
+        changes and must not be mutated by callers.
+        """
+        key = (get_config_version(), self._health_version)
+        if key != self._healthy_nodes_key:
+            healthy = []
+            for node in get_enabled_nodes():
+                health = self._node_health.get(node.name)
+                if health is None or health.is_healthy:
+                    healthy.append(node)
+            self._healthy_nodes = healthy
+            self._healthy_nodes_key = key
+        return self._healthy_nodes
 
-    def find_node_for_model(self, model: str) -> Optional[Tuple[LLMNode, httpx.AsyncClient]]:
+    def find_node_for_model(
+        self,
+        model: str,
+        messages: Optional[List[Dict[str, str]]] = None,
+    ) -> Optional[Tuple[LLMNode, httpx.AsyncClient]]:
         """
         Find a healthy node that can serve the specified model.
 
+        When several nodes serve the model, the node that last answered a
+        prompt with the same leading message is preferred, since Ollama can
+        reuse its KV cache for the shared prefix.
+
         Args:
             model: The model name to find
+            messages: Optional messages about to be sent, used for prefix affinity
 
         Returns:
             Tuple of (node, client) or None if no node found
         """
-        # First try to find from configured nodes
-        for node in get_enabled_nodes():
-            # Check if model is in the node's configured models
-            # Handle model names with and without tags (e.g., "llama3.2" vs "llama3.2:latest")
-            model_base = model.split(':')[0]
-            node_models_base = [m.split(':')[0] for m in node.models]
-
-            if model in node.models or model_base in node_models_base:
-                health = self._node_health.get(node.name)
-                if health is None or health.is_healthy:
-                    return (node, self._get_client_for_node(node))
+        # Handle model names with and without tags (e.g., "llama3.2" vs "llama3.2:latest")
+        model_base = model.split(':')[0]
+        candidates = self._get_routing_index().get(model_base)
+        if candidates:
+            # Skip nodes whose circuit breaker is open after repeated query failures
+            candidates = [n for n in candidates if not self._circuit_open(n.name)]
+        if not candidates:
+            return None
+
+        node = candidates[0]
+        if len(candidates) > 1 and messages:
+            warm_name = self._prefix_affinity.get(self._prefix_key(model_base, messages))
+            node = next((n for n in candidates if n.name == warm_name), node)
+        return (node, self._get_client_for_node(node))
+
+    @staticmethod
+    def _prefix_key(model_base: str, messages: List[Dict[str, str]]) -> Tuple[str, int]:
+        """Key identifying a model and the leading message of a prompt."""
+        return (model_base, hash(messages[0].get("content", "")))
+
+    def _record_prefix_affinity(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        node_name: str,
+    ) -> None:
+        """Remember which node just processed a prompt prefix for a model."""
+        if not messages:
+            return
+        key = self._prefix_key(model.split(':')[0], messages)
+        self._prefix_affinity[key] = node_name
+        self._prefix_affinity.move_to_end(key)
+        while len(self._prefix_affinity) > PREFIX_AFFINITY_SIZE:
+            self._prefix_affinity.popitem(last=False)
+
+    def _get_routing_index(self) -> Dict[str, List[LLMNode]]:
+        """
+        Get the base-model-name to candidate nodes routing table.
+
+        Nodes that list a model in their configuration come first, in config
+        order, followed by healthy nodes reporting the model in their last
+        health check. The table is rebuilt only when the node configuration
+        or health state has changed.
+        """
+        routing_key = (get_config_version(), self._health_version)
+        if routing_key == self._routing_key:
+            return self._routing_index
 
-        # If not found in config, try any healthy node (model might be there)
-        for node in self.get_healthy_nodes():
+        index: Dict[str, List[LLMNode]] = {}
+        healthy_nodes = self.get_healthy_nodes()
+
+        def add(model_name: str, node: LLMNode) -> None:
+            candidates = index.setdefault(model_name.split(':')[0], [])
+            if node not in candidates:
+                candidates.append(node)
+
+        # First from configured models on healthy (or not yet checked) nodes
+        for node in healthy_nodes:
+            for m in node.models:
+                add(m, node)
+
+        # Then from models the nodes actually reported (model might be there)
+        for node in healthy_nodes:
             health = self._node_health.get(node.name)
-            if health and model.split(':')[0] in [m.split(':')[0] for m in health.available_models]:
-                return (node, self._get_client_for_node(node))
+            if health:
+                for m in health.available_models:
+                    add(m, node)
 
-        return None
+        self._routing_index = index
+        self._routing_key = routing_key
+        return index
 
     async def query_model(
         self,
@@ -210,6 +556,7 @@ class DistributedLLMClient:
         messages: List[Dict[str, str]],
         timeout: float = 120.0,
         node_url: Optional[str] = None,
+        response_format: Optional[Union[str, Dict[str, Any]]] = None,
     ) -> Optional[Dict[str, Any]]:
         """
         Query a specific model, automatically routing to the correct node.
@@ -219,71 +566,87 @@ class DistributedLLMClient:
             messages: List of message dicts with 'role' and 'content'
             timeout: Request timeout in seconds
             node_url: Optional specific node URL to use (overrides auto-routing)
+            response_format: Optional Ollama output format ("json" or a JSON schema)
 
         Returns:
             Response dict with 'content' key, or None if failed
         """
-        # Find the appropriate node and client
-        if node_url:
-            # Use specific node - create temporary client
-            # Find matching node config for API key
-            api_key = None
-            for node in get_enabled_nodes():
-                if node.url == node_url:
-                    api_key = node.api_key
-                    break
+        target = self._resolve_target(model, node_url, messages)
+        if target is None:
+            return None
 
-            headers = {}
-            if api_key:
-                headers["X-API-Key"] = api_key
-
-            # Create timeout object with proper configuration
-            client_timeout = httpx.Timeout(
-                connect=10.0,
-                read=timeout,
-                write=10.0,
-                pool=5.0,
+        # Identical concurrent requests to the same node share one generation
+        key = (target[1], model, hash(orjson.dumps([messages, response_format])))
+        entry = self._inflight.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(
+                self._query_target(target, model, messages, timeout, response_format)
             )
+            entry = _InFlightRequest(task)
+            self._inflight[key] = entry
 
-            client = httpx.AsyncClient(
-                base_url=node_url,
-                headers=headers,
-                timeout=client_timeout,
-            )
-            node_name = node_url
+            def _forget(done: "asyncio.Future[Optional[Dict[str, Any]]]") -> None:
+                current = self._inflight.get(key)
+                if current is not None and current.task is done:
+                    del self._inflight[key]
+
+            task.add_done_callback(_forget)
         else:
-            # Auto-route to appropriate node
-            result = self.find_node_for_model(model)
-            if result is None:
-                print(f"[Distributed] No healthy node found for model '{model}'")
-                return None
-            node, client = result
-            node_name = node.name
+            logger.debug("Joining in-flight request for model '%s' on '%s'", model, target[1])
+
+        # Shield so one cancelled caller does not cancel the request for the
+        # others, but cancel it once nobody is left waiting for the reply
+        entry.waiters += 1
+        try:
+            result = await asyncio.shield(entry.task)
+        except asyncio.CancelledError:
+            if entry.waiters == 1:
+                if self._inflight.get(key) is entry:
+                    del self._inflight[key]
+                entry.task.cancel()
+            raise
+        finally:
+            entry.waiters -= 1
+        return dict(result) if result is not None else None
+
+    async def _query_target(
+        self,
+        target: Tuple[httpx.AsyncClient, str, Optional[asyncio.Semaphore], Optional[LLMNode]],
+        model: str,
+        messages: List[Dict[str, str]],
+        timeout: float,
+        response_format: Optional[Union[str, Dict[str, Any]]],
+    ) -> Optional[Dict[str, Any]]:
+        """Send a chat request to a resolved target, with retries."""
+        client, node_name, semaphore, node = target
+
+        request_timeout = self._request_timeout(timeout)
+        payload = self._chat_payload(model, messages, response_format)
+
+        breaker_key = node.name if node is not None else node_name
 
         # Try with retries
         last_error = None
         for attempt in range(MAX_RETRIES + 1):
             try:
-                if DISTRIBUTED_DEBUG:
-                    print(f"[Distributed] Querying model '{model}' on node '{node_name}' (attempt {attempt + 1})")
-
-                # Call the /chat endpoint
-                response = await client.post(
-                    "/chat",
-                    json={
-                        "model": model,
-                        "messages": messages,
-                        "options": {},
-                    },
-                )
-                response.raise_for_status()
+                logger.debug("Querying model '%s' on node '%s' (attempt %d)", model, node_name, attempt + 1)
+
+                # Call the /chat endpoint; Ollama serializes requests beyond its own
+                # parallelism, so cap how many we keep in flight per node
+                if semaphore is not None:
+                    async with semaphore:
+                        data = await self._send_chat(breaker_key, client, payload, request_timeout)
+                else:
+                    data = await self._send_chat(breaker_key, client, payload, request_timeout)
 
-                data = response.json()
                 message = data.get("message", {})
 
-                if DISTRIBUTED_DEBUG:
-                    content_preview = message.get('content', '')[:100]
-                    print(f"[Distributed] Got response from '{model}': {content_preview}...")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Got response from '%s': %s...", model, message.get('content', '')[:100])
+
+                self._record_query_result(breaker_key, succeeded=True)
+                if node is not None:
+                    self._record_prefix_affinity(model, messages, node.name)
 
                 return {
                     'content': message.get('content', ''),
@@ -294,15 +657,258 @@ class DistributedLLMClient:
 
             except Exception as e:
                 last_error = e
-                print(f"[Distributed] Error querying '{model}' on '{node_name}': {e}")
+                logger.warning("Error querying '%s' on '%s': %s", model, node_name, e)
+
+                if not self._is_retryable(e):
+                    break
+                if not self._is_throttled(e):
+                    self._record_query_result(breaker_key, succeeded=False)
 
                 if attempt < MAX_RETRIES:
-                    await asyncio.sleep(RETRY_DELAY)
+                    delay = self._retry_delay(attempt, e)
+                    logger.debug("Retrying '%s' on '%s' in %.2fs", model, node_name, delay)
+                    await asyncio.sleep(delay)
 
         # All retries failed
-        print(f"[Distributed] All retries failed for model '{model}': {last_error}")
+        logger.warning("Giving up on model '%s': %s", model, last_error)
         return None
 
+    async def _send_chat(
+        self,
+        node_key: str,
+        client: httpx.AsyncClient,
+        payload: Dict[str, Any],
+        timeout: httpx.Timeout,
+    ) -> Dict[str, Any]:
+        """POST a chat request, through the node's batcher when batching is enabled."""
+        if BATCH_WINDOW_MS > 0:
+            batcher = self._batchers.get(node_key)
+            if batcher is None or batcher.client is not client:
+                batcher = _ChatBatcher(client, BATCH_WINDOW_MS / 1000, BATCH_MAX_SIZE)
+                self._batchers[node_key] = batcher
+            return await batcher.submit(payload, timeout)
+
+        response = await client.post(
+            "/chat", content=orjson.dumps(payload), headers=_JSON_HEADERS, timeout=timeout
+        )
+        response.raise_for_status()
+        return orjson.loads(response.content)
+
+    async def stream_model(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        timeout: float = 120.0,
+        node_url: Optional[str] = None,
+        response_format: Optional[Union[str, Dict[str, Any]]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Query a model and yield the response incrementally as it is generated.
+
+        Nodes that stream reply with NDJSON chat chunks; nodes that do not
+        reply with a single JSON body, which is yielded as one chunk. Retries
+        only happen before the first chunk has been yielded.
+
+        Args:
+            model: Model name to query
+            messages: List of message dicts with 'role' and 'content'
+            timeout: Request timeout in seconds
+            node_url: Optional specific node URL to use (overrides auto-routing)
+            response_format: Optional Ollama output format ("json" or a JSON schema)
+
+        Yields:
+            Dicts with 'content' (the new text), 'done', 'node' and 'model' keys
+        """
+        target = self._resolve_target(model, node_url, messages)
+        if target is None:
+            return
+        client, node_name, semaphore, node = target
+
+        request_timeout = self._request_timeout(timeout)
+        payload = self._chat_payload(model, messages, response_format)
+        payload["stream"] = True
+
+        breaker_key = node.name if node is not None else node_name
+
+        last_error = None
+        for attempt in range(MAX_RETRIES + 1):
+            started = False
+            try:
+                logger.debug("Streaming model '%s' on node '%s' (attempt %d)", model, node_name, attempt + 1)
+
+                async with AsyncExitStack() as stack:
+                    if semaphore is not None:
+                        await stack.enter_async_context(semaphore)
+                    response = await stack.enter_async_context(
+                        client.stream(
+                            "POST", "/chat", content=orjson.dumps(payload),
+                            headers=_JSON_HEADERS, timeout=request_timeout,
+                        )
+                    )
+                    response.raise_for_status()
+
+                    if response.headers.get("content-type", "").startswith("application/x-ndjson"):
+                        async for line in response.aiter_lines():
+                            if not line:
+                                continue
+                            data = orjson.loads(line)
+                            if "error" in data:
+                                raise RuntimeError(data["error"])
+                            started = True
+                            yield {
+                                'content': data.get("message", {}).get('content', ''),
+                                'done': data.get("done", False),
+                                'node': node_name,
+                                'model': model,
+                            }
+                    else:
+                        # Node does not stream: the whole reply arrives as one body
+                        data = orjson.loads(await response.aread())
+                        started = True
+                        yield {
+                            'content': data.get("message", {}).get('content', ''),
+                            'done': True,
+                            'node': node_name,
+                            'model': model,
+                        }
+                self._record_query_result(breaker_key, succeeded=True)
+                if node is not None:
+                    self._record_prefix_affinity(model, messages, node.name)
+                return
+
+            except Exception as e:
+                if started:
+                    # Part of the reply was already delivered; retrying would duplicate it
+                    raise
+                last_error = e
+                logger.warning("Error streaming '%s' on '%s': %s", model, node_name, e)
+
+                if not self._is_retryable(e):
+                    break
+                if not self._is_throttled(e):
+                    self._record_query_result(breaker_key, succeeded=False)
+
+                if attempt < MAX_RETRIES:
+                    delay = self._retry_delay(attempt, e)
+                    logger.debug("Retrying '%s' on '%s' in %.2fs", model, node_name, delay)
+                    await asyncio.sleep(delay)
+
+        logger.warning("Giving up on model '%s': %s", model, last_error)
+
+    def _resolve_target(
+        self,
+        model: str,
+        node_url: Optional[str],
+        messages: Optional[List[Dict[str, str]]] = None,
+    ) -> Optional[Tuple[httpx.AsyncClient, str, Optional[asyncio.Semaphore], Optional[LLMNode]]]:
+        """
+        Pick the client to send a model query to.
+
+        Returns:
+            Tuple of (client, node name for logging/results, per-node semaphore
+            or None, configured node or None), or None if no node can serve
+            the model
+        """
+        if node_url:
+            # Use specific node - reuse its pooled client when it is configured
+            node = get_enabled_node_by_url(node_url)
+            if node is None:
+                if self._circuit_open(node_url):
+                    logger.warning("Circuit open for '%s', skipping model '%s'", node_url, model)
+                    return None
+                # Unknown URL - no node config, so no API key or concurrency cap
+                return (self._get_client_for_url(node_url), node_url, None, None)
+            if not self._circuit_open(node.name):
+                return (self._get_client_for_node(node), node_url, self._get_semaphore_for_node(node), node)
+            logger.warning("Circuit open for node '%s', failing over model '%s'", node.name, model)
+
+        # Auto-route to appropriate node
+        result = self.find_node_for_model(model, messages)
+        if result is None:
+            logger.warning("No healthy node found for model '%s'", model)
+            return None
+        node, client = result
+        return (client, node.name, self._get_semaphore_for_node(node), node)
+
+    def _circuit_open(self, node_key: str) -> bool:
+        """Whether recent query failures mean a node should not be tried yet."""
+        failures = self._query_failures.get(node_key)
+        if failures is None or failures[0] < CIRCUIT_BREAKER_THRESHOLD:
+            return False
+        return time.monotonic() - failures[1] < CIRCUIT_BREAKER_COOLDOWN
+
+    def _record_query_result(self, node_key: str, succeeded: bool) -> None:
+        """Update a node's circuit breaker after a query attempt."""
+        if succeeded:
+            self._query_failures.pop(node_key, None)
+        else:
+            count = self._query_failures.get(node_key, (0, 0.0))[0]
+            self._query_failures[node_key] = (count + 1, time.monotonic())
+
+    @staticmethod
+    def _error_status(error: Exception) -> Optional[int]:
+        """HTTP status a node answered a failed query with, sent directly or through a batch."""
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code
+        if isinstance(error, _BatchedChatError):
+            return error.status_code
+        return None
+
+    @classmethod
+    def _is_retryable(cls, error: Exception) -> bool:
+        """Client errors will fail the same way again, except timeouts and rate limits."""
+        status = cls._error_status(error)
+        if status is None:
+            return True
+        return not (400 <= status < 500) or status in (408, 429)
+
+    @classmethod
+    def _is_throttled(cls, error: Exception) -> bool:
+        """A node that timed out or is at capacity is busy, not failing, so it does not trip the breaker."""
+        return cls._error_status(error) in (408, 429)
+
+    @staticmethod
+    def _retry_delay(attempt: int, error: Optional[Exception] = None) -> float:
+        """
+        Exponential backoff with jitter for the given (zero-based) attempt,
+        but never sooner than the Retry-After the node asked for.
+        """
+        delay = min(RETRY_DELAY * 2 ** attempt, RETRY_MAX_DELAY)
+        delay += random.uniform(0, 0.25 * delay)
+        if isinstance(error, httpx.HTTPStatusError):
+            try:
+                # Nodes send delta-seconds; HTTP-date values are ignored
+                delay = max(delay, float(error.response.headers.get("Retry-After", "")))
+            except ValueError:
+                pass
+        return delay
+
+    @staticmethod
+    def _request_timeout(timeout: float) -> httpx.Timeout:
+        """Per-call timeout, matching the per-node client configuration."""
+        return httpx.Timeout(
+            connect=10.0,
+            read=timeout,
+            write=10.0,
+            pool=5.0,
+        )
+
+    @staticmethod
+    def _chat_payload(
+        model: str,
+        messages: List[Dict[str, str]],
+        response_format: Optional[Union[str, Dict[str, Any]]],
+    ) -> Dict[str, Any]:
+        """Build the body for a node's /chat endpoint."""
+        payload = {
+            "model": model,
+            "messages": messages,
+            "options": {},
+        }
+        if response_format is not None:
+            payload["format"] = response_format
+        return payload
+
     async def query_models_parallel(
         self,
         models_config: List[Dict[str, Any]],
@@ -344,19 +950,73 @@ class DistributedLLMClient:
                 model, response = result
                 responses[model] = response
             elif isinstance(result, Exception):
-                print(f"[Distributed] Query task failed with exception: {result}")
+                logger.error("Query task failed with exception: %s", result)
 
         return responses
 
+    async def iter_models_streaming(
+        self,
+        models_config: List[Dict[str, Any]],
+        messages: List[Dict[str, str]],
+    ) -> AsyncIterator[Tuple[str, Optional[Dict[str, Any]]]]:
+        """
+        Stream multiple models in parallel, yielding chunks as they arrive.
+
+        Streams still running when the caller stops iterating are cancelled.
+
+        Args:
+            models_config: List of dicts with 'model', 'node_url', 'timeout' keys
+            messages: List of message dicts to send to each model
+
+        Yields:
+            (model, chunk) tuples interleaved across models, with chunks as
+            yielded by stream_model. Each model ends with a chunk whose 'done'
+            is True, or with (model, None) if it failed
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def stream_with_config(config: Dict[str, Any]) -> None:
+            model = config["model"]
+            finished = False
+            try:
+                async for chunk in self.stream_model(
+                    model=model,
+                    messages=messages,
+                    timeout=config.get("timeout", 120.0),
+                    node_url=config.get("node_url"),
+                ):
+                    finished = chunk["done"]
+                    await queue.put((model, chunk))
+            except Exception as e:
+                logger.error("Stream task for model '%s' failed: %s", model, e)
+            if not finished:
+                await queue.put((model, None))
+
+        tasks = [asyncio.ensure_future(stream_with_config(config)) for config in models_config]
+        try:
+            remaining = len(tasks)
+            while remaining:
+                model, chunk = await queue.get()
+                if chunk is None or chunk["done"]:
+                    remaining -= 1
+                yield model, chunk
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Let the cancelled streams unwind before returning, so none is left pending
+            await asyncio.gather(*tasks, return_exceptions=True)
+
     async def query_chairman(
         self,
         messages: List[Dict[str, str]],
+        response_format: Optional[Union[str, Dict[str, Any]]] = None,
     ) -> Optional[Dict[str, Any]]:
         """
         Query the designated chairman model.
 
         Args:
             messages: List of message dicts
+            response_format: Optional Ollama output format ("json" or a JSON schema)
 
         Returns:
             Response dict or None if failed
@@ -364,7 +1024,7 @@ class DistributedLLMClient:
         chairman_config = get_chairman_config()
 
         if chairman_config is None:
-            print("[Distributed] No chairman configured!")
+            logger.error("No chairman configured!")
             return None
 
         return await self.query_model(
@@ -372,6 +1032,7 @@ class DistributedLLMClient:
             messages=messages,
             timeout=chairman_config.get("timeout", 120.0),
             node_url=chairman_config.get("node_url"),
+            response_format=response_format,
         )
 
     def get_cluster_status(self) -> Dict[str, Any]:
@@ -382,22 +1043,27 @@ class DistributedLLMClient:
             Dict with cluster status information
         """
         nodes = get_enabled_nodes()
-        healthy_count = len(self.get_healthy_nodes())
-
-        node_statuses = []
-        for node in nodes:
-            health = self._node_health.get(node.name, NodeHealth(node_name=node.name))
-            node_statuses.append({
+        # Nodes that have not been checked yet get a default (healthy) record
+        pairs = [
+            (node, self._node_health.get(node.name) or NodeHealth(node_name=node.name))
+            for node in nodes
+        ]
+        healthy_count = sum(1 for _, health in pairs if health.is_healthy)
+
+        node_statuses = [
+            {
                 "name": node.name,
                 "url": node.url,
                 "is_healthy": health.is_healthy,
-                "last_check": health.last_check.isoformat() if health.last_check else None,
+                "last_check": health.last_check.isoformat(),
                 "last_error": health.last_error,
                 "configured_models": node.models,
                 "available_models": health.available_models,
                 "is_chairman": node.is_chairman,
                 "chairman_model": node.chairman_model,
-            })
+            }
+            for node, health in pairs
+        ]
 
         chairman_config = get_chairman_config()
         all_models = get_all_council_models()
@@ -424,11 +1090,66 @@ class DistributedLLMClient:
             "all_models": all_models,
         }
 
+    async def _close_retired_clients(self):
+        """Close HTTP clients replaced after their node was edited."""
+        while self._retired_clients:
+            await self._retired_clients.pop().aclose()
+
+    @property
+    def health_version(self) -> int:
+        """A counter that changes whenever any node's health record changes."""
+        return self._health_version
+
+    def start_background_tasks(self, interval: float = HEALTH_CHECK_INTERVAL) -> None:
+        """
+        Start checking node health periodically in the background.
+
+        The first sweep runs immediately, which also resolves node addresses
+        and opens pooled connections before the first real query arrives.
+
+        Args:
+            interval: Seconds between health check sweeps
+        """
+        if self._bg_task is None or self._bg_task.done():
+            self._bg_task = asyncio.create_task(self._health_check_loop(interval))
+
+    async def _health_check_loop(self, interval: float) -> None:
+        """Run check_all_nodes_health every `interval` seconds until cancelled."""
+        while True:
+            try:
+                await self.check_all_nodes_health()
+            except Exception as e:
+                logger.warning("Background health check failed: %s", e)
+            await asyncio.sleep(interval)
+
+    async def __aenter__(self) -> "DistributedLLMClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
     async def close(self):
-        """Close all HTTP clients."""
+        """Stop background tasks, cancel in-flight requests and close all HTTP clients."""
+        if self._bg_task is not None:
+            self._bg_task.cancel()
+            try:
+                await self._bg_task
+            except asyncio.CancelledError:
+                pass
+            self._bg_task = None
+
+        for entry in list(self._inflight.values()):
+            entry.task.cancel()
+        self._inflight.clear()
+
         for client in self._http_clients.values():
             await client.aclose()
         self._http_clients.clear()
+        for client in self._url_clients.values():
+            await client.aclose()
+        self._url_clients.clear()
+        self._client_nodes.clear()
+        await self._close_retired_clients()
 
 
 # Global singleton instance
@@ -2,17 +2,23 @@
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import AsyncIterator, Callable, List, Dict, Any, Optional, Set, Tuple
 import uuid
-import json
 import asyncio
+import logging
+import math
+import weakref
+from contextlib import asynccontextmanager
+
+import orjson
 
 from . import storage
-from .council import run_full_council, generate_conversation_title, stage1_collect_responses, stage2_collect_rankings, stage3_synthesize_final, calculate_aggregate_rankings
-from .code_council import run_code_council, generate_initial_code, review_code_structured, refine_code, generate_tests, synthesize_final_code
-from .distributed import get_distributed_client
+from .council import run_full_council, generate_conversation_title, stage1_stream_responses, stage2_collect_rankings, stage3_synthesize_final, calculate_aggregate_rankings
+from .code_council import run_code_council, generate_initial_code, review_code_structured, build_review_prompt_prefix, refine_all_code, generate_tests, synthesize_final_code
+from .distributed import get_distributed_client, logger as distributed_logger
 from .config import (
     get_enabled_nodes, 
     get_all_council_models, 
@@ -22,10 +28,29 @@ from .config import (
     update_node,
     remove_node,
     get_node,
-    LLMNode
+    get_config_version,
+    LLMNode,
+    DISTRIBUTED_DEBUG,
+    STAGE1_QUORUM,
+    SSE_KEEPALIVE_INTERVAL,
 )
 
-app = FastAPI(title="LLM Council API")
+logging.basicConfig(level=logging.INFO, format="%(levelname)s [%(name)s] %(message)s")
+# httpx logs every request at INFO, which would flood the log with node traffic
+logging.getLogger("httpx").setLevel(logging.WARNING)
+if DISTRIBUTED_DEBUG:
+    distributed_logger.setLevel(logging.DEBUG)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm node connections on startup and close them on shutdown."""
+    client = get_distributed_client()
+    client.start_background_tasks()
+    yield
+    await client.close()
+
+
+app = FastAPI(title="LLM Council API", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # Enable CORS for local development
 app.add_middleware(
@@ -36,6 +61,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress JSON responses such as full conversations; Starlette's GZipMiddleware
+# leaves text/event-stream alone (from 0.46, the pinned minimum), so the SSE
+# endpoints are not buffered
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 
 class CreateConversationRequest(BaseModel):
     """Request to create a new conversation."""
@@ -55,12 +85,17 @@ class GenerateCodeRequest(BaseModel):
     max_iterations: int = 2
 
 
+# Stored conversations already match these schemas, so the endpoints below
+# serialize the stored dicts directly; the models document the API and pick
+# the fields that are returned.
 class ConversationMetadata(BaseModel):
     """Conversation metadata for list view."""
     id: str
     created_at: str
     title: str
+    type: str = "chat"
     message_count: int
+    code_generation_count: int = 0
 
 
 class Conversation(BaseModel):
@@ -71,16 +106,152 @@ class Conversation(BaseModel):
     messages: List[Dict[str, Any]]
 
 
+def _project(data: Dict[str, Any], model: type) -> Dict[str, Any]:
+    """Keep only the fields of a response model from a stored dict."""
+    return {name: data[name] for name in model.model_fields}
+
+
+# Response headers for event streams; X-Accel-Buffering stops reverse proxies
+# such as nginx from holding frames back until a buffer fills
+_SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+}
+
+
+def _sse(event: Dict[str, Any]) -> bytes:
+    """Encode an event as a Server-Sent Events frame."""
+    return b"data: " + orjson.dumps(event) + b"\n\n"
+
+
+# Frames for events without a payload, encoded once
+_SSE_STAGE1_START = _sse({"type": "stage1_start"})
+_SSE_STAGE2_START = _sse({"type": "stage2_start"})
+_SSE_STAGE3_START = _sse({"type": "stage3_start"})
+_SSE_COMPLETE = _sse({"type": "complete"})
+_SSE_CODE_GENERATION_START = _sse({"type": "code_generation_start"})
+_SSE_TEST_GENERATION_START = _sse({"type": "test_generation_start"})
+_SSE_CODE_SYNTHESIS_START = _sse({"type": "code_synthesis_start"})
+
+# SSE comment line; clients ignore it, but it keeps idle connections alive
+_SSE_PING = b": ping\n\n"
+
+
+async def _with_keepalive(frames: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Pass SSE frames through, sending a ping comment whenever none has been
+    produced for SSE_KEEPALIVE_INTERVAL seconds.
+    """
+    if SSE_KEEPALIVE_INTERVAL <= 0:
+        async for frame in frames:
+            yield frame
+        return
+
+    next_frame = asyncio.ensure_future(frames.__anext__())
+    try:
+        while True:
+            done, _ = await asyncio.wait({next_frame}, timeout=SSE_KEEPALIVE_INTERVAL)
+            if not done:
+                yield _SSE_PING
+                continue
+            try:
+                frame = next_frame.result()
+            except StopAsyncIteration:
+                return
+            yield frame
+            next_frame = asyncio.ensure_future(frames.__anext__())
+    finally:
+        # Let the pending step unwind before closing the generator it runs
+        if not next_frame.done():
+            next_frame.cancel()
+            try:
+                await next_frame
+            except BaseException:
+                pass
+        await frames.aclose()
+
+
+# Per-iteration start events only vary in the iteration number, so their
+# frames are built from a fixed prefix instead of encoding a dict each time
+_SSE_CODE_REVIEW_START_PREFIX = b'data: {"type":"code_review_start","iteration":'
+_SSE_CODE_REFINEMENT_START_PREFIX = b'data: {"type":"code_refinement_start","iteration":'
+_SSE_FINAL_CODE_REVIEW_START = _sse({"type": "code_review_start", "iteration": "final"})
+
+
+def _sse_iteration(prefix: bytes, iteration: int) -> bytes:
+    """Complete a per-iteration start frame for the given iteration number."""
+    return b"%s%d}\n\n" % (prefix, iteration)
+
+
+# Each storage update reads the conversation's metadata, changes it and
+# replaces the file (after appending to the message log, for messages). Two
+# overlapping updates would race on that read-modify-write: one's count or
+# title change would be lost, or the counts would stop matching the log
+_conversation_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+# Strong references to fire-and-forget tasks so they are not garbage collected
+_background_tasks: Set[asyncio.Task] = set()
+
+
+async def _write_conversation(write: Callable[..., Any], conversation_id: str, *args: Any, **kwargs: Any) -> Any:
+    """Run a storage update in a worker thread, one at a time per conversation."""
+    lock = _conversation_locks.get(conversation_id)
+    if lock is None:
+        lock = asyncio.Lock()
+        _conversation_locks[conversation_id] = lock
+    async with lock:
+        return await asyncio.to_thread(write, conversation_id, *args, **kwargs)
+
+
+def _spawn(coro) -> None:
+    """Run a coroutine in the background, logging (not raising) its failure."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+
+    def _done(task: asyncio.Task) -> None:
+        _background_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logging.getLogger(__name__).error("Background task failed: %s", task.exception())
+
+    task.add_done_callback(_done)
+
+
+def _cancel_pending(*tasks: Optional[asyncio.Task]) -> None:
+    """Cancel any of the given tasks that are still running."""
+    for task in tasks:
+        if task is not None and not task.done():
+            task.cancel()
+
+
+# Serialized bodies of read-only cluster endpoints, tagged with the
+# (config version, health version) they were built from
+_cluster_response_cache: Dict[str, Tuple[Tuple[int, int], bytes]] = {}
+
+
+def _cached_cluster_json(key: str, build: Callable[[], Any]) -> Response:
+    """
+    Serve a cluster endpoint body, rebuilding it only after the node
+    configuration or node health has changed.
+    """
+    version = (get_config_version(), get_distributed_client().health_version)
+    entry = _cluster_response_cache.get(key)
+    if entry is None or entry[0] != version:
+        entry = (version, orjson.dumps(build()))
+        _cluster_response_cache[key] = entry
+    return Response(content=entry[1], media_type="application/json")
+
+
 @app.get("/")
 async def root():
     """Health check endpoint."""
-    nodes = get_enabled_nodes()
-    return {
-        "status": "ok",
-        "service": "LLM Council API - Distributed",
-        "nodes_configured": len(nodes),
-        "models_available": len(get_all_council_models()),
-    }
+    def build():
+        return {
+            "status": "ok",
+            "service": "LLM Council API - Distributed",
+            "nodes_configured": len(get_enabled_nodes()),
+            "models_available": len(get_all_council_models()),
+        }
+    return _cached_cluster_json("root", build)
 
 
 # =============================================================================
@@ -96,7 +267,7 @@ async def get_cluster_status():
     and available models.
     """
     client = get_distributed_client()
-    return client.get_cluster_status()
+    return _cached_cluster_json("status", client.get_cluster_status)
 
 
 @app.post("/api/cluster/health-check")
@@ -109,35 +280,38 @@ async def run_cluster_health_check():
     client = get_distributed_client()
     health_results = await client.check_all_nodes_health()
     
-    # Convert to serializable format
-    results = {}
-    for name, health in health_results.items():
-        results[name] = {
+    # orjson encodes the datetime itself, in the same ISO format as isoformat()
+    results = {
+        name: {
             "is_healthy": health.is_healthy,
-            "last_check": health.last_check.isoformat() if health.last_check else None,
+            "last_check": health.last_check,
             "last_error": health.last_error,
             "consecutive_failures": health.consecutive_failures,
             "available_models": health.available_models,
         }
+        for name, health in health_results.items()
+    }
     
     healthy_count = sum(1 for h in health_results.values() if h.is_healthy)
     
-    return {
+    return ORJSONResponse({
         "status": "ok" if healthy_count > 0 else "degraded",
         "healthy_nodes": healthy_count,
         "total_nodes": len(health_results),
         "nodes": results,
-    }
+    })
 
 
 @app.get("/api/cluster/nodes")
 async def list_nodes():
     """List all configured nodes with their details."""
-    nodes = get_all_nodes()
-    return {
-        "nodes": [node.to_dict() for node in nodes],
-        "total": len(nodes),
-    }
+    def build():
+        nodes = get_all_nodes()
+        return {
+            "nodes": [node.to_dict() for node in nodes],
+            "total": len(nodes),
+        }
+    return _cached_cluster_json("nodes", build)
 
 
 class CreateNodeRequest(BaseModel):
@@ -151,6 +325,7 @@ class CreateNodeRequest(BaseModel):
     enabled: bool = True
     timeout: float = 120.0
     api_key: Optional[str] = None
+    max_parallel: int = Field(default=4, ge=1)
 
 
 @app.post("/api/cluster/nodes")
@@ -161,12 +336,13 @@ async def create_node_endpoint(request: CreateNodeRequest):
             name=request.name,
             host=request.host,
             port=request.port,
-            models=request.models,
+            models=tuple(request.models),
             is_chairman=request.is_chairman,
             chairman_model=request.chairman_model,
             enabled=request.enabled,
             timeout=request.timeout,
             api_key=request.api_key,
+            max_parallel=request.max_parallel,
         )
         
         add_node(node)
@@ -193,6 +369,7 @@ class UpdateNodeRequest(BaseModel):
     enabled: Optional[bool] = None
     timeout: Optional[float] = None
     api_key: Optional[str] = None
+    max_parallel: Optional[int] = Field(default=None, ge=1)
 
 
 @app.put("/api/cluster/nodes/{node_name}")
@@ -209,12 +386,13 @@ async def update_node_endpoint(node_name: str, request: UpdateNodeRequest):
             name=request.name if request.name is not None else existing_node.name,
             host=request.host if request.host is not None else existing_node.host,
             port=request.port if request.port is not None else existing_node.port,
-            models=request.models if request.models is not None else existing_node.models,
+            models=tuple(request.models) if request.models is not None else existing_node.models,
             is_chairman=request.is_chairman if request.is_chairman is not None else existing_node.is_chairman,
             chairman_model=request.chairman_model if request.chairman_model is not None else existing_node.chairman_model,
             enabled=request.enabled if request.enabled is not None else existing_node.enabled,
             timeout=request.timeout if request.timeout is not None else existing_node.timeout,
             api_key=request.api_key if request.api_key is not None else existing_node.api_key,
+            max_parallel=request.max_parallel if request.max_parallel is not None else existing_node.max_parallel,
         )
         
         update_node(node_name, updated_node_obj)
@@ -249,14 +427,14 @@ async def delete_node_endpoint(node_name: str):
 @app.get("/api/cluster/models")
 async def list_models():
     """List all available models across all nodes."""
-    models = get_all_council_models()
-    chairman = get_chairman_config()
-    
-    return {
-        "council_models": models,
-        "chairman": chairman,
-        "total_models": len(models),
-    }
+    def build():
+        models = get_all_council_models()
+        return {
+            "council_models": models,
+            "chairman": get_chairman_config(),
+            "total_models": len(models),
+        }
+    return _cached_cluster_json("models", build)
 
 
 class TestNodeRequest(BaseModel):
@@ -274,16 +452,11 @@ async def test_node(request: TestNodeRequest):
     Useful for debugging and verifying node connectivity.
     """
     client = get_distributed_client()
-    nodes = get_enabled_nodes()
     
     # Find the requested node
-    target_node = None
-    for node in nodes:
-        if node.name == request.node_name:
-            target_node = node
-            break
+    target_node = get_node(request.node_name)
     
-    if target_node is None:
+    if target_node is None or not target_node.enabled:
         raise HTTPException(status_code=404, detail=f"Node '{request.node_name}' not found")
     
     # Use specified model or first available
@@ -313,49 +486,51 @@ async def test_node(request: TestNodeRequest):
 @app.get("/api/conversations", response_model=List[ConversationMetadata])
 async def list_conversations():
     """List all conversations (metadata only)."""
-    return storage.list_conversations()
+    conversations = await asyncio.to_thread(storage.list_conversations)
+    return ORJSONResponse(conversations)
 
 
 @app.get("/api/code/conversations", response_model=List[ConversationMetadata])
 async def list_code_conversations():
     """List all code conversations (metadata only)."""
-    return storage.list_conversations(conversation_type="code")
+    conversations = await asyncio.to_thread(storage.list_conversations, conversation_type="code")
+    return ORJSONResponse(conversations)
 
 
 @app.post("/api/conversations", response_model=Conversation)
 async def create_conversation(request: CreateConversationRequest):
     """Create a new conversation."""
     conversation_id = str(uuid.uuid4())
-    conversation = storage.create_conversation(conversation_id)
-    return conversation
+    conversation = await _write_conversation(storage.create_conversation, conversation_id)
+    return ORJSONResponse(_project(conversation, Conversation))
 
 
 @app.post("/api/code/conversations", response_model=Conversation)
 async def create_code_conversation(request: CreateConversationRequest):
     """Create a new code conversation."""
     conversation_id = str(uuid.uuid4())
-    conversation = storage.create_conversation(conversation_id, conversation_type="code")
-    return conversation
+    conversation = await _write_conversation(storage.create_conversation, conversation_id, conversation_type="code")
+    return ORJSONResponse(_project(conversation, Conversation))
 
 
 @app.get("/api/conversations/{conversation_id}", response_model=Conversation)
 async def get_conversation(conversation_id: str):
     """Get a specific conversation with all its messages."""
-    conversation = storage.get_conversation(conversation_id)
+    conversation = await asyncio.to_thread(storage.get_conversation, conversation_id)
     if conversation is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
-    return conversation
+    return ORJSONResponse(_project(conversation, Conversation))
 
 
 @app.get("/api/code/conversations/{conversation_id}", response_model=Conversation)
 async def get_code_conversation(conversation_id: str):
     """Get a specific code conversation with all its data."""
-    conversation = storage.get_conversation(conversation_id)
+    conversation = await asyncio.to_thread(storage.get_conversation, conversation_id)
     if conversation is None:
         raise HTTPException(status_code=404, detail="Code conversation not found")
     if conversation.get("type") != "code":
         raise HTTPException(status_code=400, detail="Not a code conversation")
-    return conversation
+    return ORJSONResponse(_project(conversation, Conversation))
 
 
 @app.post("/api/conversations/{conversation_id}/message")
@@ -365,41 +540,50 @@ async def send_message(conversation_id: str, request: SendMessageRequest):
     Returns the complete response with all stages.
     """
     # Check if conversation exists
-    conversation = storage.get_conversation(conversation_id)
+    conversation = await asyncio.to_thread(storage.get_conversation_metadata, conversation_id)
     if conversation is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
     # Check if this is the first message
-    is_first_message = len(conversation["messages"]) == 0
+    is_first_message = conversation["message_count"] == 0
 
     # Add user message
-    storage.add_user_message(conversation_id, request.content)
+    await _write_conversation(storage.add_user_message, conversation_id, request.content)
 
-    # If this is the first message, generate a title
+    # If this is the first message, generate a title while the council runs
+    title_task = None
     if is_first_message:
-        title = await generate_conversation_title(request.content)
-        storage.update_conversation_title(conversation_id, title)
+        title_task = asyncio.create_task(generate_conversation_title(request.content))
 
-    # Run the 3-stage council process
-    stage1_results, stage2_results, stage3_result, metadata = await run_full_council(
-        request.content
-    )
+    try:
+        # Run the 3-stage council process
+        stage1_results, stage2_results, stage3_result, metadata = await run_full_council(
+            request.content
+        )
+
+        if title_task:
+            title = await title_task
+            await _write_conversation(storage.update_conversation_title, conversation_id, title)
+    finally:
+        _cancel_pending(title_task)
 
     # Add assistant message with all stages
-    storage.add_assistant_message(
+    await _write_conversation(
+        storage.add_assistant_message,
         conversation_id,
         stage1_results,
         stage2_results,
         stage3_result
     )
 
-    # Return the complete response with metadata
-    return {
+    # Return the complete response with metadata; the dict is already
+    # API-shaped, so it skips FastAPI's jsonable_encoder pass
+    return ORJSONResponse({
         "stage1": stage1_results,
         "stage2": stage2_results,
         "stage3": stage3_result,
         "metadata": metadata
-    }
+    })
 
 
 @app.post("/api/conversations/{conversation_id}/message/stream")
@@ -409,47 +593,71 @@ async def send_message_stream(conversation_id: str, request: SendMessageRequest)
     Returns Server-Sent Events as each stage completes.
     """
     # Check if conversation exists
-    conversation = storage.get_conversation(conversation_id)
+    conversation = await asyncio.to_thread(storage.get_conversation_metadata, conversation_id)
     if conversation is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
     # Check if this is the first message
-    is_first_message = len(conversation["messages"]) == 0
+    is_first_message = conversation["message_count"] == 0
 
     async def event_generator():
+        title_task = None
+        stage2_task = None
+        stage3_task = None
         try:
             # Add user message
-            storage.add_user_message(conversation_id, request.content)
+            await _write_conversation(storage.add_user_message, conversation_id, request.content)
 
             # Start title generation in parallel (don't await yet)
-            title_task = None
             if is_first_message:
                 title_task = asyncio.create_task(generate_conversation_title(request.content))
 
-            # Stage 1: Collect responses
-            yield f"data: {json.dumps({'type': 'stage1_start'})}\n\n"
-            stage1_results = await stage1_collect_responses(request.content)
-            yield f"data: {json.dumps({'type': 'stage1_complete', 'data': stage1_results})}\n\n"
+            # Stage 1: Collect responses, streaming each one as it arrives
+            yield _SSE_STAGE1_START
+            quorum = math.ceil(STAGE1_QUORUM * len(get_all_council_models()))
+            stage1_results = []
+            async for kind, result in stage1_stream_responses(request.content):
+                if kind == 'token':
+                    yield _sse({'type': 'stage1_token', 'data': result})
+                    continue
+                stage1_results.append(result)
+                yield _sse({'type': 'stage1_partial', 'data': result})
+                # Once enough responses are in, start ranking them while the rest finish
+                if stage2_task is None and STAGE1_QUORUM < 1 and len(stage1_results) >= quorum:
+                    stage2_task = asyncio.create_task(
+                        stage2_collect_rankings(request.content, list(stage1_results))
+                    )
+            yield _sse({'type': 'stage1_complete', 'data': stage1_results})
 
             # Stage 2: Collect rankings
-            yield f"data: {json.dumps({'type': 'stage2_start'})}\n\n"
-            stage2_results, label_to_model = await stage2_collect_rankings(request.content, stage1_results)
+            yield _SSE_STAGE2_START
+            if stage2_task is not None:
+                stage2_results, label_to_model = await stage2_task
+            else:
+                stage2_results, label_to_model = await stage2_collect_rankings(request.content, stage1_results)
+            # Stage 3 does not need the aggregate rankings, so the chairman request
+            # is started first and is in flight while the Stage 2 frame is sent
+            stage3_task = asyncio.create_task(
+                stage3_synthesize_final(request.content, stage1_results, stage2_results)
+            )
             aggregate_rankings = calculate_aggregate_rankings(stage2_results, label_to_model)
-            yield f"data: {json.dumps({'type': 'stage2_complete', 'data': stage2_results, 'metadata': {'label_to_model': label_to_model, 'aggregate_rankings': aggregate_rankings}})}\n\n"
+            yield _sse({'type': 'stage2_complete', 'data': stage2_results, 'metadata': {'label_to_model': label_to_model, 'aggregate_rankings': aggregate_rankings}})
 
             # Stage 3: Synthesize final answer
-            yield f"data: {json.dumps({'type': 'stage3_start'})}\n\n"
-            stage3_result = await stage3_synthesize_final(request.content, stage1_results, stage2_results)
-            yield f"data: {json.dumps({'type': 'stage3_complete', 'data': stage3_result})}\n\n"
+            yield _SSE_STAGE3_START
+            stage3_result = await stage3_task
+            yield _sse({'type': 'stage3_complete', 'data': stage3_result})
 
             # Wait for title generation if it was started
             if title_task:
                 title = await title_task
-                storage.update_conversation_title(conversation_id, title)
-                yield f"data: {json.dumps({'type': 'title_complete', 'data': {'title': title}})}\n\n"
+                # Send the title right away; the file write finishes in the background
+                _spawn(_write_conversation(storage.update_conversation_title, conversation_id, title))
+                yield _sse({'type': 'title_complete', 'data': {'title': title}})
 
             # Save complete assistant message
-            storage.add_assistant_message(
+            await _write_conversation(
+                storage.add_assistant_message,
                 conversation_id,
                 stage1_results,
                 stage2_results,
@@ -457,19 +665,19 @@ async def send_message_stream(conversation_id: str, request: SendMessageRequest)
             )
 
             # Send completion event
-            yield f"data: {json.dumps({'type': 'complete'})}\n\n"
+            yield _SSE_COMPLETE
 
         except Exception as e:
             # Send error event
-            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+            yield _sse({'type': 'error', 'message': str(e)})
+        finally:
+            # Stop work the client will never see if the stream ended early
+            _cancel_pending(title_task, stage2_task, stage3_task)
 
     return StreamingResponse(
-        event_generator(),
+        _with_keepalive(event_generator()),
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-        }
+        headers=_SSE_HEADERS,
     )
 
 
@@ -484,35 +692,47 @@ async def generate_code(conversation_id: str, request: GenerateCodeRequest):
     Returns the complete code generation result.
     """
     # Check if conversation exists
-    conversation = storage.get_conversation(conversation_id)
+    conversation = await asyncio.to_thread(storage.get_conversation_metadata, conversation_id)
     if conversation is None:
         raise HTTPException(status_code=404, detail="Code conversation not found")
     if conversation.get("type") != "code":
         raise HTTPException(status_code=400, detail="Not a code conversation")
 
+    # Check if this is the first message
+    is_first_message = conversation["message_count"] == 0
+
     # Add specification
-    storage.add_code_specification(
+    await _write_conversation(
+        storage.add_code_specification,
         conversation_id,
         request.specification,
         request.language,
         request.framework
     )
 
-    # Generate title if first message
-    if len(conversation["messages"]) == 0:
-        title = await generate_conversation_title(request.specification)
-        storage.update_conversation_title(conversation_id, title)
+    # Generate title if first message, while the code council runs
+    title_task = None
+    if is_first_message:
+        title_task = asyncio.create_task(generate_conversation_title(request.specification))
 
-    # Run code council
-    result = await run_code_council(
-        request.specification,
-        request.language,
-        request.framework,
-        request.max_iterations
-    )
+    try:
+        # Run code council
+        result = await run_code_council(
+            request.specification,
+            request.language,
+            request.framework,
+            request.max_iterations
+        )
+
+        if title_task:
+            title = await title_task
+            await _write_conversation(storage.update_conversation_title, conversation_id, title)
+    finally:
+        _cancel_pending(title_task)
 
     # Save code generation
-    storage.add_code_generation(
+    await _write_conversation(
+        storage.add_code_generation,
         conversation_id,
         request.specification,
         result["iterations"],
@@ -522,7 +742,7 @@ async def generate_code(conversation_id: str, request: GenerateCodeRequest):
         result["metadata"]
     )
 
-    return result
+    return ORJSONResponse(result)
 
 
 @app.post("/api/code/conversations/{conversation_id}/generate/stream")
@@ -532,19 +752,21 @@ async def generate_code_stream(conversation_id: str, request: GenerateCodeReques
     Returns Server-Sent Events as each stage completes.
     """
     # Check if conversation exists
-    conversation = storage.get_conversation(conversation_id)
+    conversation = await asyncio.to_thread(storage.get_conversation_metadata, conversation_id)
     if conversation is None:
         raise HTTPException(status_code=404, detail="Code conversation not found")
     if conversation.get("type") != "code":
         raise HTTPException(status_code=400, detail="Not a code conversation")
 
     # Check if this is the first message
-    is_first_message = len(conversation["messages"]) == 0
+    is_first_message = conversation["message_count"] == 0
 
     async def event_generator():
+        title_task = None
         try:
             # Add specification
-            storage.add_code_specification(
+            await _write_conversation(
+                storage.add_code_specification,
                 conversation_id,
                 request.specification,
                 request.language,
@@ -552,89 +774,90 @@ async def generate_code_stream(conversation_id: str, request: GenerateCodeReques
             )
 
             # Start title generation in parallel
-            title_task = None
             if is_first_message:
                 title_task = asyncio.create_task(generate_conversation_title(request.specification))
 
             # Stage 1: Initial code generation
-            yield f"data: {json.dumps({'type': 'code_generation_start'})}\n\n"
+            yield _SSE_CODE_GENERATION_START
             code_submissions = await generate_initial_code(
                 request.specification,
                 request.language,
                 request.framework
             )
-            yield f"data: {json.dumps({'type': 'code_generation_complete', 'data': code_submissions})}\n\n"
+            yield _sse({'type': 'code_generation_complete', 'data': code_submissions})
 
             if not code_submissions:
-                yield f"data: {json.dumps({'type': 'error', 'message': 'All models failed to generate code'})}\n\n"
+                yield _sse({'type': 'error', 'message': 'All models failed to generate code'})
                 return
 
             current_submissions = code_submissions
+            review_prefix = build_review_prompt_prefix(request.specification)
+            # Submission lists are never mutated, so iterations reference them directly
             iterations = [{
                 "iteration": 0,
-                "code_submissions": code_submissions.copy(),
+                "code_submissions": code_submissions,
                 "reviews": []
             }]
 
             # Iterative refinement
             for iteration_num in range(1, request.max_iterations + 1):
                 # Review current submissions
-                yield f"data: {json.dumps({'type': 'code_review_start', 'iteration': iteration_num})}\n\n"
-                reviews, label_to_model = await review_code_structured(current_submissions, request.specification)
-                yield f"data: {json.dumps({'type': 'code_review_complete', 'iteration': iteration_num, 'data': reviews, 'label_to_model': label_to_model})}\n\n"
+                yield _sse_iteration(_SSE_CODE_REVIEW_START_PREFIX, iteration_num)
+                reviews, label_to_model = await review_code_structured(current_submissions, request.specification, review_prefix)
+                yield _sse({'type': 'code_review_complete', 'iteration': iteration_num, 'data': reviews, 'label_to_model': label_to_model})
 
                 # Store reviews and label mapping
                 iterations[-1]["reviews"] = reviews
                 iterations[-1]["label_to_model"] = label_to_model
 
                 # Refine code
-                yield f"data: {json.dumps({'type': 'code_refinement_start', 'iteration': iteration_num})}\n\n"
-                refined_submissions = []
-                for submission in current_submissions:
-                    refined = await refine_code(submission, reviews, request.specification, iteration_num)
-                    refined_submissions.append(refined)
-                
+                yield _sse_iteration(_SSE_CODE_REFINEMENT_START_PREFIX, iteration_num)
+                refined_submissions = await refine_all_code(
+                    current_submissions, reviews, label_to_model, request.specification, iteration_num
+                )
                 current_submissions = refined_submissions
-                yield f"data: {json.dumps({'type': 'code_refinement_complete', 'iteration': iteration_num, 'data': refined_submissions})}\n\n"
+                yield _sse({'type': 'code_refinement_complete', 'iteration': iteration_num, 'data': refined_submissions})
 
                 # Store iteration
                 iterations.append({
                     "iteration": iteration_num,
-                    "code_submissions": current_submissions.copy(),
+                    "code_submissions": current_submissions,
                     "reviews": []
                 })
 
             # Final review
-            yield f"data: {json.dumps({'type': 'code_review_start', 'iteration': 'final'})}\n\n"
-            final_reviews, final_label_to_model = await review_code_structured(current_submissions, request.specification)
+            yield _SSE_FINAL_CODE_REVIEW_START
+            final_reviews, final_label_to_model = await review_code_structured(current_submissions, request.specification, review_prefix)
             iterations[-1]["reviews"] = final_reviews
             iterations[-1]["label_to_model"] = final_label_to_model
-            yield f"data: {json.dumps({'type': 'code_review_complete', 'iteration': 'final', 'data': final_reviews, 'label_to_model': final_label_to_model})}\n\n"
+            yield _sse({'type': 'code_review_complete', 'iteration': 'final', 'data': final_reviews, 'label_to_model': final_label_to_model})
 
             # Generate tests
-            yield f"data: {json.dumps({'type': 'test_generation_start'})}\n\n"
+            yield _SSE_TEST_GENERATION_START
             best_code = current_submissions[0]["code"]
             tests = await generate_tests(best_code, request.specification, request.language)
-            yield f"data: {json.dumps({'type': 'test_generation_complete', 'data': tests})}\n\n"
+            yield _sse({'type': 'test_generation_complete', 'data': tests})
 
             # Synthesize final code
-            yield f"data: {json.dumps({'type': 'code_synthesis_start'})}\n\n"
+            yield _SSE_CODE_SYNTHESIS_START
             final_result = await synthesize_final_code(
                 current_submissions,
                 final_reviews,
                 tests,
                 request.specification
             )
-            yield f"data: {json.dumps({'type': 'code_synthesis_complete', 'data': final_result})}\n\n"
+            yield _sse({'type': 'code_synthesis_complete', 'data': final_result})
 
             # Wait for title generation if it was started
             if title_task:
                 title = await title_task
-                storage.update_conversation_title(conversation_id, title)
-                yield f"data: {json.dumps({'type': 'title_complete', 'data': {'title': title}})}\n\n"
+                # Send the title right away; the file write finishes in the background
+                _spawn(_write_conversation(storage.update_conversation_title, conversation_id, title))
+                yield _sse({'type': 'title_complete', 'data': {'title': title}})
 
             # Save complete code generation
-            storage.add_code_generation(
+            await _write_conversation(
+                storage.add_code_generation,
                 conversation_id,
                 request.specification,
                 iterations,
@@ -649,19 +872,19 @@ async def generate_code_stream(conversation_id: str, request: GenerateCodeReques
             )
 
             # Send completion event
-            yield f"data: {json.dumps({'type': 'complete'})}\n\n"
+            yield _SSE_COMPLETE
 
         except Exception as e:
             # Send error event
-            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+            yield _sse({'type': 'error', 'message': str(e)})
+        finally:
+            # Stop work the client will never see if the stream ended early
+            _cancel_pending(title_task)
 
     return StreamingResponse(
-        event_generator(),
+        _with_keepalive(event_generator()),
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-        }
+        headers=_SSE_HEADERS,
     )
 
 
@@ -1,12 +1,20 @@
 import ollama
 from typing import List, Dict, Any, Optional
-from .config import OLLAMA_API_URL
+from .config import OLLAMA_API_URL, OLLAMA_MAX_CONCURRENT
 import asyncio
 
 
+# Shared async client so its HTTP connection pool is reused across queries
+_client = ollama.AsyncClient(host=OLLAMA_API_URL)
+
+# Keeps parallel queries within what the server runs at once instead of
+# queueing (and timing out) inside Ollama
+_semaphore = asyncio.Semaphore(OLLAMA_MAX_CONCURRENT)
+
+
 def _get_ollama_client():
-    """ Get an Ollama client instance """    
-    return ollama.Client()
+    """ Get the shared Ollama client instance """
+    return _client
 
 
 async def query_model(
@@ -14,15 +22,11 @@ async def query_model(
     messages: List[Dict[str, str]],
 ) -> Optional[Dict[str, Any]]:
     try:
-        client = _get_ollama_client()
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(
-            None,
-            lambda: client.chat(
+        async with _semaphore:
+            response = await _get_ollama_client().chat(
                 model=model_name,
                 messages=messages
             )
-        )
 
         message = response.get('message', {})
 
@@ -0,0 +1,167 @@
+"""In-process cache of model responses for repeated prompts.
+
+Enabled with COUNCIL_PROMPT_CACHE=1. Entries are keyed by the model name and
+a digest of the exact messages and response format sent, so a cached answer is only reused for an
+identical prompt (for Stage 2 that includes every Stage 1 response).
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+import orjson
+
+from .distributed import get_distributed_client
+from .config import PROMPT_CACHE_ENABLED, PROMPT_CACHE_SIZE, PROMPT_CACHE_TTL
+
+# Cached responses keyed by (model, prompt digest), least recently used first
+_prompt_cache: "OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+
+def _prompt_cache_key(
+    model: str,
+    messages: List[Dict[str, str]],
+    response_format: Optional[Union[str, Dict[str, Any]]] = None
+) -> Tuple[str, str]:
+    """ Build the cache key for a model/messages/response format triple """
+    payload = orjson.dumps([messages, response_format], option=orjson.OPT_SORT_KEYS)
+    return (model, hashlib.blake2b(payload, digest_size=16).hexdigest())
+
+
+def _prompt_cache_get(key: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+    """ Return a copy of a cached response if it exists and has not expired """
+    entry = _prompt_cache.get(key)
+    if entry is None:
+        return None
+    expires_at, response = entry
+    if expires_at < time.monotonic():
+        del _prompt_cache[key]
+        return None
+    _prompt_cache.move_to_end(key)
+    # Callers annotate responses in place, so each one gets its own dict
+    return dict(response)
+
+
+def _prompt_cache_put(key: Tuple[str, str], response: Dict[str, Any]) -> None:
+    """ Store a response, evicting the least recently used entries past PROMPT_CACHE_SIZE """
+    _prompt_cache[key] = (time.monotonic() + PROMPT_CACHE_TTL, dict(response))
+    _prompt_cache.move_to_end(key)
+    while len(_prompt_cache) > PROMPT_CACHE_SIZE:
+        _prompt_cache.popitem(last=False)
+
+
+async def cached_query(
+    model: str,
+    messages: List[Dict[str, str]],
+    query: Callable[[], Awaitable[Optional[Dict[str, Any]]]],
+    response_format: Optional[Union[str, Dict[str, Any]]] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Answer a prompt from the cache, or run `query` and cache its response.
+
+    Args:
+        model: Model the prompt is sent to (part of the cache key)
+        messages: Messages sent to the model (part of the cache key)
+        query: Coroutine factory that sends the prompt on a cache miss
+        response_format: Output format `query` requests (part of the cache key)
+
+    Returns:
+        Response dict, or None if the query failed (failures are not cached)
+    """
+    if not PROMPT_CACHE_ENABLED:
+        return await query()
+
+    key = _prompt_cache_key(model, messages, response_format)
+    cached = _prompt_cache_get(key)
+    if cached is not None:
+        return cached
+
+    response = await query()
+    if response is not None:
+        _prompt_cache_put(key, response)
+    return response
+
+
+async def query_model_cached(
+    model: str,
+    messages: List[Dict[str, str]],
+    timeout: float = 120.0
+) -> Optional[Dict[str, Any]]:
+    """ Query a single model, answering repeated prompts from the prompt cache """
+    client = get_distributed_client()
+    return await cached_query(
+        model, messages, lambda: client.query_model(model=model, messages=messages, timeout=timeout)
+    )
+
+
+async def query_models_cached(
+    models_config: List[Dict[str, Any]],
+    messages: List[Dict[str, str]]
+) -> Dict[str, Optional[Dict[str, Any]]]:
+    """ Query models in parallel, answering repeated prompts from the prompt cache """
+    client = get_distributed_client()
+    if not PROMPT_CACHE_ENABLED:
+        return await client.query_models_parallel(models_config, messages)
+
+    responses = {}
+    misses = []
+    for config in models_config:
+        cached = _prompt_cache_get(_prompt_cache_key(config["model"], messages))
+        if cached is not None:
+            responses[config["model"]] = cached
+        else:
+            misses.append(config)
+
+    if misses:
+        fresh = await client.query_models_parallel(misses, messages)
+        for model, response in fresh.items():
+            if response is not None:
+                _prompt_cache_put(_prompt_cache_key(model, messages), response)
+        responses.update(fresh)
+
+    # Keep the configured model order so response labels stay stable
+    return {c["model"]: responses[c["model"]] for c in models_config if c["model"] in responses}
+
+
+async def stream_models_cached(
+    models_config: List[Dict[str, Any]],
+    messages: List[Dict[str, str]]
+) -> AsyncIterator[Tuple[str, Optional[Dict[str, Any]]]]:
+    """
+    Stream models in parallel, answering repeated prompts from the prompt cache.
+
+    Cached responses come first, each as a single done chunk; the rest are
+    passed through from the client's iter_models_streaming and cached once
+    their final chunk arrives.
+    """
+    client = get_distributed_client()
+    misses = models_config
+    if PROMPT_CACHE_ENABLED:
+        misses = []
+        for config in models_config:
+            cached = _prompt_cache_get(_prompt_cache_key(config["model"], messages))
+            if cached is not None:
+                yield config["model"], {
+                    'content': cached.get('content', ''),
+                    'done': True,
+                    'node': cached.get('node', 'unknown'),
+                    'model': config["model"],
+                }
+            else:
+                misses.append(config)
+
+    parts: Dict[str, List[str]] = {}
+    # aclosing cancels outstanding streams as soon as the caller stops iterating
+    async with aclosing(client.iter_models_streaming(misses, messages)) as chunks:
+        async for model, chunk in chunks:
+            if PROMPT_CACHE_ENABLED and chunk is not None:
+                parts.setdefault(model, []).append(chunk['content'])
+                if chunk['done']:
+                    _prompt_cache_put(_prompt_cache_key(model, messages), {
+                        'content': ''.join(parts.pop(model)),
+                        'node': chunk['node'],
+                        'model': model,
+                    })
+            yield model, chunk
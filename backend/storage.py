@@ -1,12 +1,37 @@
-"""JSON-based storage for conversations."""
+"""JSON-based storage for conversations.
 
-import json
+Each conversation is stored as two files in DATA_DIR:
+
+- `{id}.meta.json`: id, created_at, title, type and message counts
+- `{id}.messages.jsonl`: one JSON message per line, only ever appended to
+
+Adding a message therefore writes only that message plus the small metadata
+file instead of re-serializing the whole conversation. Code generations are
+stored once, inside their assistant message, and `code_generations` is
+rebuilt from the messages on load. Conversations saved in the older
+single-file `{id}.json` format are migrated the first time they are read.
+"""
+
+import orjson
 import os
-from datetime import datetime
+import threading
+from datetime import datetime, timezone
 from typing import List, Dict, Any, Optional
 from pathlib import Path
 from .config import DATA_DIR
 
+_META_SUFFIX = ".meta.json"
+_MESSAGES_SUFFIX = ".messages.jsonl"
+_LEGACY_SUFFIX = ".json"
+
+# Serializes migration of legacy files, which may be triggered from several threads
+_migration_lock = threading.Lock()
+
+
+def _now_iso() -> str:
+    """Current UTC time as an ISO 8601 string."""
+    return datetime.now(timezone.utc).isoformat(timespec='milliseconds')
+
 
 def ensure_data_dir():
     """Ensure the data directory exists."""
@@ -14,8 +39,107 @@ def ensure_data_dir():
 
 
 def get_conversation_path(conversation_id: str) -> str:
-    """Get the file path for a conversation."""
-    return os.path.join(DATA_DIR, f"{conversation_id}.json")
+    """Get the metadata file path for a conversation."""
+    return os.path.join(DATA_DIR, f"{conversation_id}{_META_SUFFIX}")
+
+
+def _messages_path(conversation_id: str) -> str:
+    """Get the message log path for a conversation."""
+    return os.path.join(DATA_DIR, f"{conversation_id}{_MESSAGES_SUFFIX}")
+
+
+def _legacy_path(conversation_id: str) -> str:
+    """Get the path of a conversation saved in the single-file format."""
+    return os.path.join(DATA_DIR, f"{conversation_id}{_LEGACY_SUFFIX}")
+
+
+def _write_atomic(path: str, data: bytes):
+    """
+    Write a file atomically.
+
+    Readers may run in other threads, so the data goes to a temporary file
+    which then replaces the target; a reader never sees a partial file.
+
+    Args:
+        path: Destination file path
+        data: File contents
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _build_meta(conversation: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the metadata record for a full conversation dict."""
+    messages = conversation.get("messages", [])
+    return {
+        "id": conversation["id"],
+        "created_at": conversation["created_at"],
+        "title": conversation.get("title", "New Conversation"),
+        "type": conversation.get("type", "chat"),
+        "message_count": len(messages),
+        "code_generation_count": sum(1 for m in messages if m.get("type") == "code_generation"),
+    }
+
+
+def _write_files(conversation: Dict[str, Any]):
+    """Write both files of a conversation from a full conversation dict."""
+    conversation_id = conversation["id"]
+    lines = b"".join(orjson.dumps(m) + b"\n" for m in conversation.get("messages", []))
+    _write_atomic(_messages_path(conversation_id), lines)
+    _write_atomic(get_conversation_path(conversation_id), orjson.dumps(_build_meta(conversation)))
+
+
+def _migrate_legacy(conversation_id: str):
+    """Convert a single-file conversation to the metadata + message log layout."""
+    with _migration_lock:
+        legacy_path = _legacy_path(conversation_id)
+        if os.path.exists(get_conversation_path(conversation_id)) or not os.path.exists(legacy_path):
+            return
+        with open(legacy_path, 'rb') as f:
+            _write_files(orjson.loads(f.read()))
+        os.remove(legacy_path)
+
+
+def _read_meta(conversation_id: str) -> Optional[Dict[str, Any]]:
+    """Load a conversation's metadata, or None if it does not exist."""
+    path = get_conversation_path(conversation_id)
+    if not os.path.exists(path):
+        _migrate_legacy(conversation_id)
+    try:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    except FileNotFoundError:
+        return None
+
+
+def _read_messages(conversation_id: str) -> List[Dict[str, Any]]:
+    """Load a conversation's messages from its log."""
+    try:
+        with open(_messages_path(conversation_id), 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return []
+    # Every record ends with a newline, so anything after the last one is an
+    # append still in progress and is left for the next read
+    return [orjson.loads(line) for line in data.split(b"\n")[:-1] if line]
+
+
+def _assemble(meta: Dict[str, Any], messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Build the conversation dict returned to callers."""
+    conversation = {
+        "id": meta["id"],
+        "created_at": meta["created_at"],
+        "title": meta["title"],
+        "type": meta["type"],
+        "messages": messages,
+    }
+    if meta["type"] == "code":
+        conversation["code_generations"] = [
+            m["code_generation"] for m in messages if m.get("type") == "code_generation"
+        ]
+    return conversation
 
 
 def create_conversation(conversation_id: str, conversation_type: str = "chat") -> Dict[str, Any]:
@@ -33,19 +157,17 @@ def create_conversation(conversation_id: str, conversation_type: str = "chat") -
 
     conversation = {
         "id": conversation_id,
-        "created_at": datetime.utcnow().isoformat(),
+        "created_at": _now_iso(),
         "title": "New Conversation",
         "type": conversation_type,
         "messages": []
     }
-    
+
     if conversation_type == "code":
         conversation["code_generations"] = []
 
-    # Save to file
-    path = get_conversation_path(conversation_id)
-    with open(path, 'w') as f:
-        json.dump(conversation, f, indent=2)
+    # Save to files
+    _write_files(conversation)
 
     return conversation
 
@@ -60,27 +182,36 @@ def get_conversation(conversation_id: str) -> Optional[Dict[str, Any]]:
     Returns:
         Conversation dict or None if not found
     """
-    path = get_conversation_path(conversation_id)
-
-    if not os.path.exists(path):
+    meta = _read_meta(conversation_id)
+    if meta is None:
         return None
+    return _assemble(meta, _read_messages(conversation_id))
+
+
+def get_conversation_metadata(conversation_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Load only a conversation's metadata, without reading its messages.
 
-    with open(path, 'r') as f:
-        return json.load(f)
+    Args:
+        conversation_id: Unique identifier for the conversation
+
+    Returns:
+        Dict with 'id', 'created_at', 'title', 'type', 'message_count' and
+        'code_generation_count', or None if not found
+    """
+    return _read_meta(conversation_id)
 
 
 def save_conversation(conversation: Dict[str, Any]):
     """
-    Save a conversation to storage.
+    Save a conversation to storage, rewriting both of its files.
 
     Args:
         conversation: Conversation dict to save
     """
     ensure_data_dir()
 
-    path = get_conversation_path(conversation['id'])
-    with open(path, 'w') as f:
-        json.dump(conversation, f, indent=2)
+    _write_files(conversation)
 
 
 def list_conversations(conversation_type: Optional[str] = None) -> List[Dict[str, Any]]:
@@ -96,26 +227,28 @@ def list_conversations(conversation_type: Optional[str] = None) -> List[Dict[str
     ensure_data_dir()
 
     conversations = []
+    seen = set()
     for filename in os.listdir(DATA_DIR):
-        if filename.endswith('.json'):
-            path = os.path.join(DATA_DIR, filename)
-            with open(path, 'r') as f:
-                data = json.load(f)
-                conv_type = data.get("type", "chat")
-                
-                # Filter by type if specified
-                if conversation_type and conv_type != conversation_type:
-                    continue
-                
-                # Return metadata only
-                conversations.append({
-                    "id": data["id"],
-                    "created_at": data["created_at"],
-                    "title": data.get("title", "New Conversation"),
-                    "type": conv_type,
-                    "message_count": len(data.get("messages", [])),
-                    "code_generation_count": len(data.get("code_generations", []))
-                })
+        if filename.endswith(_META_SUFFIX):
+            conversation_id = filename[:-len(_META_SUFFIX)]
+        elif filename.endswith(_LEGACY_SUFFIX):
+            conversation_id = filename[:-len(_LEGACY_SUFFIX)]
+        else:
+            continue
+        # A conversation migrated during the listing shows up under both names
+        if conversation_id in seen:
+            continue
+        seen.add(conversation_id)
+
+        data = _read_meta(conversation_id)
+        if data is None:
+            continue
+
+        # Filter by type if specified
+        if conversation_type and data["type"] != conversation_type:
+            continue
+
+        conversations.append(data)
 
     # Sort by creation time, newest first
     conversations.sort(key=lambda x: x["created_at"], reverse=True)
@@ -123,6 +256,76 @@ def list_conversations(conversation_type: Optional[str] = None) -> List[Dict[str
     return conversations
 
 
+def _require_meta(conversation_id: str, conversation_type: Optional[str] = None) -> Dict[str, Any]:
+    """Load a conversation's metadata, raising ValueError if it is missing or of the wrong type."""
+    meta = _read_meta(conversation_id)
+    if meta is None:
+        raise ValueError(f"Conversation {conversation_id} not found")
+    if conversation_type is not None and meta["type"] != conversation_type:
+        raise ValueError(f"Conversation {conversation_id} is not a {conversation_type} conversation")
+    return meta
+
+
+def _update(meta: Dict[str, Any], message: Optional[Dict[str, Any]] = None):
+    """
+    Persist a metadata change, appending a message to the log first if given.
+
+    Args:
+        meta: Conversation metadata, already holding the change
+        message: Message to append, if any
+    """
+    conversation_id = meta["id"]
+    if message is not None:
+        _append_record(_messages_path(conversation_id), orjson.dumps(message) + b"\n")
+    _write_atomic(get_conversation_path(conversation_id), orjson.dumps(meta))
+
+
+def _append_record(path: str, record: bytes):
+    """
+    Append a newline-terminated record to a message log.
+
+    An append cut short by a crash leaves a partial record without its
+    newline. Readers skip it, but a later append would be glued onto it and
+    produce an invalid line, so it is truncated away before writing.
+
+    Args:
+        path: Message log path
+        record: Encoded record, ending with a newline
+    """
+    try:
+        f = open(path, 'r+b')
+    except FileNotFoundError:
+        f = open(path, 'wb')
+    with f:
+        end = f.seek(0, os.SEEK_END)
+        if end:
+            f.seek(end - 1)
+            if f.read(1) != b"\n":
+                f.truncate(_last_record_end(f, end))
+                f.seek(0, os.SEEK_END)
+        f.write(record)
+
+
+def _last_record_end(f, end: int, block_size: int = 65536) -> int:
+    """Offset just past the last newline before `end`, or 0 if there is none."""
+    while end > 0:
+        start = max(0, end - block_size)
+        f.seek(start)
+        newline = f.read(end - start).rfind(b"\n")
+        if newline != -1:
+            return start + newline + 1
+        end = start
+    return 0
+
+
+def _append_message(meta: Dict[str, Any], message: Dict[str, Any]):
+    """Append a message to a conversation and update its counts."""
+    meta["message_count"] += 1
+    if message.get("type") == "code_generation":
+        meta["code_generation_count"] += 1
+    _update(meta, message)
+
+
 def add_user_message(conversation_id: str, content: str):
     """
     Add a user message to a conversation.
@@ -131,17 +334,13 @@ def add_user_message(conversation_id: str, content: str):
         conversation_id: Conversation identifier
         content: User message content
     """
-    conversation = get_conversation(conversation_id)
-    if conversation is None:
-        raise ValueError(f"Conversation {conversation_id} not found")
+    meta = _require_meta(conversation_id)
 
-    conversation["messages"].append({
+    _append_message(meta, {
         "role": "user",
         "content": content
     })
 
-    save_conversation(conversation)
-
 
 def add_assistant_message(
     conversation_id: str,
@@ -158,19 +357,15 @@ def add_assistant_message(
         stage2: List of model rankings
         stage3: Final synthesized response
     """
-    conversation = get_conversation(conversation_id)
-    if conversation is None:
-        raise ValueError(f"Conversation {conversation_id} not found")
+    meta = _require_meta(conversation_id)
 
-    conversation["messages"].append({
+    _append_message(meta, {
         "role": "assistant",
         "stage1": stage1,
         "stage2": stage2,
         "stage3": stage3
     })
 
-    save_conversation(conversation)
-
 
 def update_conversation_title(conversation_id: str, title: str):
     """
@@ -180,12 +375,10 @@ def update_conversation_title(conversation_id: str, title: str):
         conversation_id: Conversation identifier
         title: New title for the conversation
     """
-    conversation = get_conversation(conversation_id)
-    if conversation is None:
-        raise ValueError(f"Conversation {conversation_id} not found")
+    meta = _require_meta(conversation_id)
 
-    conversation["title"] = title
-    save_conversation(conversation)
+    meta["title"] = title
+    _update(meta)
 
 
 # =============================================================================
@@ -202,14 +395,9 @@ def add_code_specification(conversation_id: str, specification: str, language: O
         language: Programming language (optional)
         framework: Framework/library (optional)
     """
-    conversation = get_conversation(conversation_id)
-    if conversation is None:
-        raise ValueError(f"Conversation {conversation_id} not found")
-    
-    if conversation.get("type") != "code":
-        raise ValueError(f"Conversation {conversation_id} is not a code conversation")
+    meta = _require_meta(conversation_id, "code")
 
-    conversation["messages"].append({
+    _append_message(meta, {
         "role": "user",
         "content": specification,
         "specification": specification,
@@ -217,8 +405,6 @@ def add_code_specification(conversation_id: str, specification: str, language: O
         "framework": framework
     })
 
-    save_conversation(conversation)
-
 
 def add_code_generation(
     conversation_id: str,
@@ -241,33 +427,21 @@ def add_code_generation(
         tests: List of test submissions
         metadata: Metadata (language, framework, etc.)
     """
-    conversation = get_conversation(conversation_id)
-    if conversation is None:
-        raise ValueError(f"Conversation {conversation_id} not found")
-    
-    if conversation.get("type") != "code":
-        raise ValueError(f"Conversation {conversation_id} is not a code conversation")
+    meta = _require_meta(conversation_id, "code")
 
     code_generation = {
         "specification": specification,
-        "created_at": datetime.utcnow().isoformat(),
+        "created_at": _now_iso(),
         "iterations": iterations,
         "final_code": final_code,
         "final_tests": final_tests,
         "tests": tests,
         "metadata": metadata
     }
-    
-    if "code_generations" not in conversation:
-        conversation["code_generations"] = []
-    
-    conversation["code_generations"].append(code_generation)
-    
-    # Also add as assistant message for consistency
-    conversation["messages"].append({
+
+    # Stored as an assistant message; code_generations is rebuilt from these on load
+    _append_message(meta, {
         "role": "assistant",
         "type": "code_generation",
         "code_generation": code_generation
     })
-
-    save_conversation(conversation)
@@ -150,6 +150,33 @@ function App() {
             });
             break;
 
+          case 'stage1_token':
+            setCurrentConversation((prev) => {
+              const messages = [...prev.messages];
+              const lastMsg = messages[messages.length - 1];
+              const stage1 = [...(lastMsg.stage1 || [])];
+              const index = stage1.findIndex((r) => r.model === event.data.model);
+              if (index === -1) {
+                stage1.push({ model: event.data.model, response: event.data.content });
+              } else {
+                stage1[index] = { ...stage1[index], response: stage1[index].response + event.data.content };
+              }
+              lastMsg.stage1 = stage1;
+              return { ...prev, messages };
+            });
+            break;
+
+          case 'stage1_partial':
+            setCurrentConversation((prev) => {
+              const messages = [...prev.messages];
+              const lastMsg = messages[messages.length - 1];
+              // Replaces the text streamed so far by stage1_token events
+              const stage1 = (lastMsg.stage1 || []).filter((r) => r.model !== event.data.model);
+              lastMsg.stage1 = [...stage1, event.data];
+              return { ...prev, messages };
+            });
+            break;
+
           case 'stage1_complete':
             setCurrentConversation((prev) => {
               const messages = [...prev.messages];
@@ -1,5 +1,11 @@
+"""Entry point that runs the LLM Council backend API."""
+
+from backend.main import app
+
+
 def main():
-    print("Hello from llm-council!")
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8001)
 
 
 if __name__ == "__main__":
@@ -24,23 +24,52 @@ Usage:
     # Specify models to advertise
     python node_server.py --models llama3.2 mistral
 
+    # Several worker processes (limits such as OLLAMA_NUM_PARALLEL apply per worker)
+    python node_server.py --workers 4
+
 Environment Variables:
     NODE_NAME: Human-readable name for this node (default: hostname)
     NODE_PORT: Port to run the server on (default: 8080)
     NODE_API_KEY: API key for authentication (optional)
+    NODE_MODELS: Comma-separated models to advertise (optional)
+    WEB_CONCURRENCY: Number of worker processes (default: 1)
+    NODE_MAX_PARALLEL: Max requests from one /chat/batch run at once (default: 8)
+    OLLAMA_NUM_PARALLEL: Requests sent to Ollama at once; match Ollama's own
+        setting (default: 4)
+    NODE_MAX_QUEUE: Requests allowed to wait for Ollama before new ones get
+        a 429 (default: 16)
     OLLAMA_HOST: Ollama host URL (default: http://localhost:11434)
+    OLLAMA_READ_TIMEOUT: Seconds to wait for Ollama to respond (default: 600)
+    NODE_BREAKER_THRESHOLD: Consecutive Ollama failures before the node stops
+        trying for a while (default: 5)
+    NODE_BREAKER_COOLDOWN: Seconds to answer 503 after that (default: 30)
+    NODE_MODEL_LIST_TTL: Seconds to reuse Ollama's model list (default: 10)
+    NODE_KEEP_ALIVE: How long Ollama keeps a model loaded after a request, e.g.
+        "30m", or -1 to keep it loaded; empty uses Ollama's own
+        OLLAMA_KEEP_ALIVE (default: 30m)
 """
 
 import argparse
+import asyncio
+import hmac
 import os
 import socket
-from typing import List, Dict, Any, Optional
+import time
+from dataclasses import dataclass
 from datetime import datetime
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, List, Dict, Any, Optional, Tuple, Union
 
+import httpx
 import ollama
-from fastapi import FastAPI, HTTPException, Header, Depends
+import orjson
+from fastapi import FastAPI, HTTPException, Header, Depends, Request
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, ValidationError
+# Pydantic only accepts typing.TypedDict from Python 3.12 on
+from typing_extensions import TypedDict
 import uvicorn
 
 
@@ -48,24 +77,123 @@ import uvicorn
 # Configuration
 # =============================================================================
 
-NODE_NAME = os.getenv("NODE_NAME", socket.gethostname())
-NODE_PORT = int(os.getenv("NODE_PORT", "8080"))
-NODE_API_KEY = os.getenv("NODE_API_KEY")
+class NodeConfig(BaseModel):
+    """Node identity, authentication and advertised models."""
+    name: str
+    port: int
+    api_key: Optional[str] = None
+    # Models to advertise; empty advertises everything Ollama has installed
+    advertised_models: List[str] = []
+
+    @classmethod
+    def from_env(cls) -> "NodeConfig":
+        """Read the settings from NODE_NAME, NODE_PORT, NODE_API_KEY and NODE_MODELS."""
+        return cls(
+            name=os.getenv("NODE_NAME", socket.gethostname()),
+            port=int(os.getenv("NODE_PORT", "8080")),
+            api_key=os.getenv("NODE_API_KEY") or None,
+            advertised_models=[m for m in os.getenv("NODE_MODELS", "").split(",") if m],
+        )
+
+
+NODE_MAX_PARALLEL = int(os.getenv("NODE_MAX_PARALLEL", "8"))
+# Ollama queues requests beyond its own OLLAMA_NUM_PARALLEL internally, where
+# callers cannot see it; the node queues them itself instead and turns clients
+# away with a 429 once NODE_MAX_QUEUE are already waiting
+OLLAMA_NUM_PARALLEL = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+NODE_MAX_QUEUE = int(os.getenv("NODE_MAX_QUEUE", "16"))
 OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+OLLAMA_READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", "600"))
+# While Ollama is down, fail requests immediately instead of letting each one
+# wait out its connection attempt
+NODE_BREAKER_THRESHOLD = int(os.getenv("NODE_BREAKER_THRESHOLD", "5"))
+NODE_BREAKER_COOLDOWN = float(os.getenv("NODE_BREAKER_COOLDOWN", "30"))
+# The model list only changes when models are pulled or removed, so health
+# and info polls reuse it for this many seconds
+NODE_MODEL_LIST_TTL = float(os.getenv("NODE_MODEL_LIST_TTL", "10"))
+
+
+def _parse_keep_alive(value: str) -> Optional[Union[str, int]]:
+    """Ollama reads a bare number as seconds and anything else as a duration like "30m"."""
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+# Ollama unloads idle models after 5 minutes by default, and reloading a large
+# model can take far longer than the request itself
+NODE_KEEP_ALIVE = _parse_keep_alive(os.getenv("NODE_KEEP_ALIVE", "30m"))
+
+# Connection pool for the Ollama client. Generations often run longer than
+# httpx's default 5s keep-alive expiry, which would drop idle connections
+# between requests and force a new handshake each time.
+OLLAMA_POOL_LIMITS = httpx.Limits(
+    max_connections=64,
+    max_keepalive_connections=32,
+    keepalive_expiry=60,
+)
 
 # Parse Ollama host for the client
 from urllib.parse import urlparse
 parsed = urlparse(OLLAMA_HOST)
-ollama_client = ollama.Client(host=f"{parsed.hostname}:{parsed.port or 11434}")
+# The connection pool is built here rather than inside ollama's httpx client
+# so shutdown can close it without reaching into ollama's private attributes;
+# ollama.AsyncClient only accepts httpx settings, not a ready-made client
+ollama_transport = httpx.AsyncHTTPTransport(limits=OLLAMA_POOL_LIMITS)
+# Async client so Ollama calls do not block the event loop; it is shared by all
+# requests so its connection pool is reused
+ollama_client = ollama.AsyncClient(
+    host=f"{parsed.hostname}:{parsed.port or 11434}",
+    transport=ollama_transport,
+    timeout=httpx.Timeout(connect=5.0, read=OLLAMA_READ_TIMEOUT, write=10.0, pool=10.0),
+)
 
 
 # =============================================================================
 # FastAPI App
 # =============================================================================
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Load the node settings on startup and close the Ollama connection pool
+    on shutdown.
+
+    Settings are read here rather than at import so that every worker
+    process picks up the environment main() prepared for it.
+    """
+    config = NodeConfig.from_env()
+    app.state.config = config
+    app.state.ollama_transport = ollama_transport
+    # Encoded once for the constant-time comparison in verify_api_key
+    app.state.api_key_bytes = config.api_key.encode("utf-8") if config.api_key else None
+    app.title = f"LLM Council Node: {config.name}"
+    # Liveness probes hit / and /info constantly; build their fixed parts once
+    app.state.root_body = orjson.dumps({
+        "status": "ok",
+        "node": config.name,
+        "service": "LLM Council Node",
+    })
+    app.state.info_template = {
+        "name": config.name,
+        "host": socket.gethostname(),
+        "port": config.port,
+        "ollama_host": OLLAMA_HOST,
+        "authenticated": config.api_key is not None,
+    }
+    yield
+    await app.state.ollama_transport.aclose()
+
+
 app = FastAPI(
-    title=f"LLM Council Node: {NODE_NAME}",
+    title="LLM Council Node",
     description="A node in the distributed LLM Council network",
+    lifespan=lifespan,
+    # Chat replies carry whole generations; orjson encodes them much faster
+    default_response_class=ORJSONResponse,
 )
 
 app.add_middleware(
@@ -81,9 +209,19 @@ app.add_middleware(
 # Authentication
 # =============================================================================
 
-async def verify_api_key(x_api_key: Optional[str] = Header(None)):
+def get_config(request: Request) -> NodeConfig:
+    """Dependency returning the node settings loaded at startup."""
+    return request.app.state.config
+
+
+async def verify_api_key(request: Request, x_api_key: Optional[str] = Header(None)):
     """Verify API key if authentication is enabled."""
-    if NODE_API_KEY and x_api_key != NODE_API_KEY:
+    expected = request.app.state.api_key_bytes
+    if expected is None:
+        return True
+    # compare_digest takes the same time wherever the keys differ, so response
+    # timing does not reveal how much of a guessed key was right
+    if x_api_key is None or not hmac.compare_digest(x_api_key.encode("utf-8"), expected):
         raise HTTPException(status_code=401, detail="Invalid or missing API key")
     return True
 
@@ -92,7 +230,9 @@ async def verify_api_key(x_api_key: Optional[str] = Header(None)):
 # Models
 # =============================================================================
 
-class ChatMessage(BaseModel):
+# A TypedDict validates straight into the plain dicts Ollama takes, so long
+# histories are passed on without building and converting a model per message
+class ChatMessage(TypedDict):
     """A chat message."""
     role: str
     content: str
@@ -103,6 +243,9 @@ class ChatRequest(BaseModel):
     model: str
     messages: List[ChatMessage]
     options: Optional[Dict[str, Any]] = None
+    format: Optional[Union[str, Dict[str, Any]]] = None  # "json" or a JSON schema
+    keep_alive: Optional[Union[str, int]] = None  # Defaults to NODE_KEEP_ALIVE
+    stream: bool = False  # Reply with NDJSON chunks as they are generated
 
 
 class ChatResponse(BaseModel):
@@ -113,6 +256,22 @@ class ChatResponse(BaseModel):
     done: bool
 
 
+# /chat parses its body itself (see chat()), so its schema is declared here;
+# nested models refer to the components FastAPI already emits for the others
+_CHAT_REQUEST_SCHEMA = ChatRequest.model_json_schema(ref_template="#/components/schemas/{model}")
+_CHAT_REQUEST_SCHEMA.pop("$defs", None)
+
+
+class BatchChatRequest(BaseModel):
+    """Several chat requests sent in one call."""
+    requests: List[ChatRequest]
+
+
+class BatchChatResponse(BaseModel):
+    """Responses to a batch, in request order; failed requests hold an 'error' message and 'status' instead."""
+    responses: List[Dict[str, Any]]
+
+
 class NodeInfo(BaseModel):
     """Information about this node."""
     name: str
@@ -128,20 +287,143 @@ class NodeInfo(BaseModel):
 # State
 # =============================================================================
 
-_start_time = datetime.now()
-_advertised_models: List[str] = []
+_start_monotonic = time.monotonic()
+
+# Caps how many requests of a batch are handed to Ollama at once
+_batch_semaphore = asyncio.Semaphore(NODE_MAX_PARALLEL)
 
+# Slots for requests running on Ollama, and how many requests hold or wait for one
+_ollama_semaphore = asyncio.Semaphore(OLLAMA_NUM_PARALLEL)
+_inflight = 0
+_queued = 0
 
-def set_advertised_models(models: List[str]):
-    """Set the list of models this node advertises."""
-    global _advertised_models
-    _advertised_models = models
+# Consecutive upstream failures, and the monotonic time until which calls are refused
+_breaker = {"fails": 0, "open_until": 0.0}
+
+# (expiry on the monotonic clock, base names, entries) of the last model list
+_model_list_cache: Optional[Tuple[float, List[str], List["ModelEntry"]]] = None
+_model_list_lock = asyncio.Lock()
+
+
+@dataclass(slots=True)
+class ModelEntry:
+    """A model installed in Ollama."""
+    name: str  # Full name including the tag, e.g. "llama3.2:latest"
+    size: int
+    modified_at: str
+
+
+def _parse_model_list(response: Any) -> List[ModelEntry]:
+    """Normalize ollama_client.list() output, which older library versions return as a plain dict."""
+    entries = []
+    for m in response.get('models', []):
+        # Newer versions name the field 'model', older ones 'name'
+        modified_at = m.get('modified_at') or ''
+        entries.append(ModelEntry(
+            name=m.get('model') or m.get('name') or '',
+            size=m.get('size') or 0,
+            modified_at=modified_at.isoformat() if isinstance(modified_at, datetime) else str(modified_at),
+        ))
+    return entries
+
+
+async def _get_models() -> Tuple[List[str], List[ModelEntry]]:
+    """
+    Get the models installed in Ollama, refreshed at most every
+    NODE_MODEL_LIST_TTL seconds.
+
+    Failures are not cached, so the next call asks Ollama again.
+
+    Returns:
+        Tuple of (base model names without tags, model entries)
+    """
+    global _model_list_cache
+    cache = _model_list_cache
+    if cache is not None and cache[0] > time.monotonic():
+        return cache[1], cache[2]
+    async with _model_list_lock:
+        # Concurrent callers wait for one refresh instead of each asking Ollama
+        cache = _model_list_cache
+        if cache is not None and cache[0] > time.monotonic():
+            return cache[1], cache[2]
+        entries = _parse_model_list(await ollama_client.list())
+        names = [entry.name.split(':')[0] for entry in entries]
+        _model_list_cache = (time.monotonic() + NODE_MODEL_LIST_TTL, names, entries)
+        return names, entries
+
+
+def _record_upstream(error: Optional[Exception] = None) -> None:
+    """Update the circuit breaker after an Ollama call; pass the error if it failed."""
+    if error is None:
+        _breaker["fails"] = 0
+        return
+    # The request was at fault (e.g. an unknown model), not Ollama
+    if isinstance(error, ollama.ResponseError) and 400 <= error.status_code < 500:
+        return
+    _breaker["fails"] += 1
+    if _breaker["fails"] >= NODE_BREAKER_THRESHOLD:
+        _breaker["open_until"] = time.monotonic() + NODE_BREAKER_COOLDOWN
+
+
+async def _call_upstream(call: Callable[[], Awaitable[Any]]) -> Any:
+    """Run an Ollama call within OLLAMA_READ_TIMEOUT, recording the outcome for the circuit breaker."""
+    try:
+        result = await asyncio.wait_for(call(), OLLAMA_READ_TIMEOUT)
+    except StopAsyncIteration:
+        # An empty stream is a normal end
+        _record_upstream()
+        raise
+    except asyncio.TimeoutError:
+        error = TimeoutError(f"Ollama did not respond within {OLLAMA_READ_TIMEOUT:g}s")
+        _record_upstream(error)
+        raise error from None
+    except Exception as e:
+        _record_upstream(e)
+        raise
+    _record_upstream()
+    return result
+
+
+@asynccontextmanager
+async def _ollama_slot():
+    """
+    Hold one of the OLLAMA_NUM_PARALLEL slots for an upstream Ollama call.
+
+    Raises:
+        HTTPException: 503 while the circuit breaker is open, or 429 if
+            NODE_MAX_QUEUE requests are already waiting for a slot; both
+            with Retry-After
+    """
+    global _inflight, _queued
+    remaining = _breaker["open_until"] - time.monotonic()
+    if remaining > 0:
+        raise HTTPException(
+            status_code=503,
+            detail="Ollama is failing, not retrying yet",
+            headers={"Retry-After": str(int(remaining) + 1)},
+        )
+    if _queued >= NODE_MAX_QUEUE:
+        raise HTTPException(
+            status_code=429,
+            detail="Node is at capacity",
+            headers={"Retry-After": "1"},
+        )
+    _queued += 1
+    try:
+        await _ollama_semaphore.acquire()
+    finally:
+        _queued -= 1
+    _inflight += 1
+    try:
+        yield
+    finally:
+        _inflight -= 1
+        _ollama_semaphore.release()
 
 
 def get_uptime() -> str:
     """Get the node uptime as a human-readable string."""
-    delta = datetime.now() - _start_time
-    hours, remainder = divmod(int(delta.total_seconds()), 3600)
+    hours, remainder = divmod(int(time.monotonic() - _start_monotonic), 3600)
     minutes, seconds = divmod(remainder, 60)
     return f"{hours}h {minutes}m {seconds}s"
 
@@ -151,117 +433,250 @@ def get_uptime() -> str:
 # =============================================================================
 
 @app.get("/")
-async def root():
+async def root(request: Request):
     """Health check endpoint."""
-    return {
-        "status": "ok",
-        "node": NODE_NAME,
-        "service": "LLM Council Node",
-    }
+    return Response(content=request.app.state.root_body, media_type="application/json")
 
 
 @app.get("/health")
-async def health():
+async def health(config: NodeConfig = Depends(get_config)):
     """Detailed health check."""
     try:
         # Check Ollama connectivity
-        response = ollama_client.list()
+        available_models, _ = await _get_models()
         ollama_status = "ok"
-        # Handle both old dict format and new object format from Ollama library
-        if hasattr(response, 'models'):
-            available_models = [m.model.split(':')[0] for m in response.models]
-        else:
-            available_models = [m.get('name', '').split(':')[0] for m in response.get('models', [])]
     except Exception as e:
         ollama_status = f"error: {e}"
         available_models = []
 
     return {
         "status": "ok" if ollama_status == "ok" else "degraded",
-        "node": NODE_NAME,
+        "node": config.name,
         "ollama_status": ollama_status,
         "available_models": available_models,
-        "advertised_models": _advertised_models or available_models,
+        "advertised_models": config.advertised_models or available_models,
         "uptime": get_uptime(),
+        "inflight": _inflight,
+        "queued": _queued,
+        "circuit_open": _breaker["open_until"] > time.monotonic(),
     }
 
 
 @app.get("/info", response_model=NodeInfo)
-async def get_info():
+async def get_info(request: Request, config: NodeConfig = Depends(get_config)):
     """Get information about this node."""
     try:
-        models = ollama_client.list()
-        available_models = [m.get('name', '').split(':')[0] for m in models.get('models', [])]
+        available_models, _ = await _get_models()
     except Exception:
         available_models = []
     
-    return NodeInfo(
-        name=NODE_NAME,
-        host=socket.gethostname(),
-        port=NODE_PORT,
-        models=_advertised_models or available_models,
-        ollama_host=OLLAMA_HOST,
-        uptime=get_uptime(),
-        authenticated=NODE_API_KEY is not None,
-    )
+    # Already NodeInfo-shaped, so it is returned without validating it again
+    return ORJSONResponse({
+        **request.app.state.info_template,
+        "models": config.advertised_models or available_models,
+        "uptime": get_uptime(),
+    })
 
 
 @app.get("/models")
-async def list_models():
+async def list_models(config: NodeConfig = Depends(get_config)):
     """List available models on this node."""
     try:
-        models = ollama_client.list()
-        available_models = []
-        for m in models.get('models', []):
-            available_models.append({
-                "name": m.get('name', ''),
-                "size": m.get('size', 0),
-                "modified_at": m.get('modified_at', ''),
-            })
+        _, entries = await _get_models()
         return {
-            "models": available_models,
-            "advertised": _advertised_models,
+            "models": [
+                {"name": m.name, "size": m.size, "modified_at": m.modified_at}
+                for m in entries
+            ],
+            "advertised": config.advertised_models,
         }
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Failed to list models: {e}")
 
 
-@app.post("/chat", response_model=ChatResponse, dependencies=[Depends(verify_api_key)])
-async def chat(request: ChatRequest):
+def _chat_kwargs(request: ChatRequest) -> Dict[str, Any]:
+    """Build the ollama_client.chat() arguments for a chat request."""
+    return {
+        "model": request.model,
+        "messages": request.messages,
+        "options": request.options or {},
+        "format": request.format,
+        "keep_alive": request.keep_alive if request.keep_alive is not None else NODE_KEEP_ALIVE,
+    }
+
+
+def _chat_error_status(error: Exception) -> int:
+    """
+    HTTP status for a failed chat: the node's own 429/503, Ollama's 4xx when
+    the request itself was at fault (e.g. an unknown model), otherwise 503.
+    """
+    if isinstance(error, HTTPException):
+        return error.status_code
+    if isinstance(error, ollama.ResponseError) and 400 <= error.status_code < 500:
+        return error.status_code
+    return 503
+
+
+def _chat_record(model: str, response: Any, node: str) -> Dict[str, Any]:
+    """Wrap an Ollama chat reply (or streamed chunk) in the ChatResponse shape."""
+    message = response.get('message', {})
+    return {
+        "model": model,
+        "message": {
+            "role": message.get('role', 'assistant'),
+            "content": message.get('content', ''),
+        },
+        "node": node,
+        "done": response.get('done', True),
+    }
+
+
+async def _run_chat(request: ChatRequest, node: str) -> ChatResponse:
+    """Send one chat request to Ollama and wrap the reply with node information."""
+    async with _ollama_slot():
+        response = await _call_upstream(lambda: ollama_client.chat(**_chat_kwargs(request)))
+    return ChatResponse(**_chat_record(request.model, response, node))
+
+
+class _SlotStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that releases its Ollama slot once it is done sending.
+
+    lines() releases the slot itself, but only if Starlette starts iterating
+    it; a client that disconnects first never runs its finally, so the slot
+    is also released here. AsyncExitStack.aclose() is a no-op the second time.
+    """
+
+    def __init__(self, content: AsyncIterator[bytes], slot: AsyncExitStack, **kwargs: Any):
+        super().__init__(content, **kwargs)
+        self._slot = slot
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self._slot.aclose()
+
+
+async def _ndjson_stream(
+    start: Callable[[], Awaitable[AsyncIterator[Any]]],
+    to_record: Callable[[Any], Dict[str, Any]],
+    label: str,
+) -> StreamingResponse:
+    """
+    Stream Ollama chunks to the client as NDJSON, one record per line.
+
+    The first chunk is awaited before the response starts, so a request that
+    Ollama rejects outright still fails with a 503 instead of an empty 200.
+    A failure after that is reported as a final {"error": ...} line. The
+    Ollama slot is held until the last line has been sent.
+    """
+    slot = AsyncExitStack()
+    await slot.enter_async_context(_ollama_slot())
+    try:
+        chunks = await start()
+        if hasattr(chunks, "aclose"):
+            # Closes the upstream request if the client leaves before lines() runs
+            slot.push_async_callback(chunks.aclose)
+        first = await _call_upstream(chunks.__anext__)
+    except StopAsyncIteration:
+        first = None
+    except Exception as e:
+        await slot.aclose()
+        raise HTTPException(status_code=503, detail=f"{label} failed: {e}")
+    except BaseException:
+        # Cancelled (the client went away) before the response was returned
+        await slot.aclose()
+        raise
+
+    async def lines():
+        try:
+            if first is not None:
+                yield orjson.dumps(to_record(first)) + b"\n"
+            async for chunk in chunks:
+                yield orjson.dumps(to_record(chunk)) + b"\n"
+        except Exception as e:
+            _record_upstream(e)
+            yield orjson.dumps({"error": f"{label} failed: {e}"}) + b"\n"
+        finally:
+            await slot.aclose()
+
+    return _SlotStreamingResponse(lines(), slot, media_type="application/x-ndjson")
+
+
+@app.post(
+    "/chat",
+    response_model=ChatResponse,
+    dependencies=[Depends(verify_api_key)],
+    openapi_extra={"requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": _CHAT_REQUEST_SCHEMA}},
+    }},
+)
+async def chat(raw_request: Request, config: NodeConfig = Depends(get_config)):
     """
     Chat with a model on this node.
     
     This endpoint mirrors the Ollama chat API but adds node information.
+    With "stream": true the reply is NDJSON, one ChatResponse-shaped chunk
+    per line, the last one with "done": true.
+
+    The body is validated straight from its raw bytes and the reply is
+    serialized by pydantic directly, skipping FastAPI's intermediate dict
+    on both sides; the schema and errors stay the same as a ChatRequest
+    parameter would give.
     """
     try:
-        # Convert messages to dict format
-        messages = [{"role": m.role, "content": m.content} for m in request.messages]
-        
-        # Call Ollama
-        response = ollama_client.chat(
-            model=request.model,
-            messages=messages,
-            options=request.options or {},
+        request = ChatRequest.model_validate_json(await raw_request.body())
+    except ValidationError as e:
+        raise RequestValidationError([
+            {**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)
+        ])
+
+    if request.stream:
+        return await _ndjson_stream(
+            lambda: ollama_client.chat(**_chat_kwargs(request), stream=True),
+            lambda c: _chat_record(request.model, c, config.name),
+            "Chat",
         )
-        
-        message = response.get('message', {})
-        
-        return ChatResponse(
-            model=request.model,
-            message=ChatMessage(
-                role=message.get('role', 'assistant'),
-                content=message.get('content', ''),
-            ),
-            node=NODE_NAME,
-            done=response.get('done', True),
-        )
-        
+
+    try:
+        response = await _run_chat(request, config.name)
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=503, detail=f"Chat failed: {e}")
+        raise HTTPException(status_code=_chat_error_status(e), detail=f"Chat failed: {e}")
+    return Response(response.model_dump_json(), media_type="application/json")
+
+
+@app.post("/chat/batch", response_model=BatchChatResponse, dependencies=[Depends(verify_api_key)])
+async def chat_batch(request: BatchChatRequest, config: NodeConfig = Depends(get_config)):
+    """
+    Run several chat requests concurrently in one call.
+
+    Saves a round trip per request and lets Ollama work on them in parallel
+    (up to OLLAMA_NUM_PARALLEL). A failed request does not fail the batch:
+    its entry is {"error": message, "status": code} instead of a chat
+    response, with the status /chat would have answered that request with.
+    """
+    async def run_bounded(chat_request: ChatRequest) -> ChatResponse:
+        async with _batch_semaphore:
+            return await _run_chat(chat_request, config.name)
+
+    results = await asyncio.gather(
+        *(run_bounded(r) for r in request.requests),
+        return_exceptions=True,
+    )
+
+    return BatchChatResponse(responses=[
+        {"error": f"Chat failed: {result}", "status": _chat_error_status(result)}
+        if isinstance(result, Exception) else result.model_dump()
+        for result in results
+    ])
 
 
 @app.post("/generate", dependencies=[Depends(verify_api_key)])
-async def generate(request: Dict[str, Any]):
+async def generate(request: Dict[str, Any], config: NodeConfig = Depends(get_config)):
     """
     Generate text with a model (non-chat completion).
     
@@ -274,19 +689,30 @@ async def generate(request: Dict[str, Any]):
         if not model or not prompt:
             raise HTTPException(status_code=400, detail="'model' and 'prompt' are required")
         
-        response = ollama_client.generate(
+        stream = bool(request.get('stream', False))
+        upstream = lambda: ollama_client.generate(
             model=model,
             prompt=prompt,
             options=request.get('options', {}),
+            keep_alive=request.get('keep_alive', NODE_KEEP_ALIVE),
+            stream=stream,
         )
         
-        return {
-            "model": model,
-            "response": response.get('response', ''),
-            "node": NODE_NAME,
-            "done": response.get('done', True),
-        }
+        def to_record(chunk: Any) -> Dict[str, Any]:
+            return {
+                "model": model,
+                "response": chunk.get('response', ''),
+                "node": config.name,
+                "done": chunk.get('done', True),
+            }
+
+        if stream:
+            return await _ndjson_stream(upstream, to_record, "Generate")
+        async with _ollama_slot():
+            return to_record(await _call_upstream(upstream))
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Generate failed: {e}")
 
@@ -296,33 +722,53 @@ async def generate(request: Dict[str, Any]):
 # =============================================================================
 
 def main():
-    # Update globals
-    global NODE_NAME, NODE_PORT, NODE_API_KEY
+    defaults = NodeConfig.from_env()
 
     parser = argparse.ArgumentParser(description="LLM Council Node Server")
-    parser.add_argument("--port", type=int, default=NODE_PORT, help="Port to run on")
-    parser.add_argument("--name", type=str, default=NODE_NAME, help="Node name")
-    parser.add_argument("--api-key", type=str, default=NODE_API_KEY, help="API key for auth")
+    parser.add_argument("--port", type=int, default=defaults.port, help="Port to run on")
+    parser.add_argument("--name", type=str, default=defaults.name, help="Node name")
+    parser.add_argument("--api-key", type=str, default=defaults.api_key, help="API key for auth")
     parser.add_argument("--models", nargs="+", help="Models to advertise")
     parser.add_argument("--host", type=str, default="0.0.0.0", help="Host to bind to")
+    parser.add_argument(
+        "--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")),
+        help="Number of worker processes",
+    )
 
     args = parser.parse_args()
-    NODE_NAME = args.name
-    NODE_PORT = args.port
-    NODE_API_KEY = args.api_key
+
+    # The app reads its settings from the environment when it starts (in
+    # every worker), so command line overrides are passed on through it
+    os.environ["NODE_NAME"] = args.name
+    os.environ["NODE_PORT"] = str(args.port)
+    if args.api_key:
+        os.environ["NODE_API_KEY"] = args.api_key
     
     if args.models:
-        set_advertised_models(args.models)
+        os.environ["NODE_MODELS"] = ",".join(args.models)
     
-    print(f"🚀 Starting LLM Council Node: {NODE_NAME}")
+    print(f"🚀 Starting LLM Council Node: {args.name}")
     print(f"   Port: {args.port}")
     print(f"   Ollama: {OLLAMA_HOST}")
     print(f"   Auth: {'enabled' if args.api_key else 'disabled'}")
+    print(f"   Keep alive: {NODE_KEEP_ALIVE if NODE_KEEP_ALIVE is not None else 'Ollama default (OLLAMA_KEEP_ALIVE)'}")
     if args.models:
         print(f"   Models: {', '.join(args.models)}")
+    if args.workers > 1:
+        print(f"   Workers: {args.workers}")
     print()
     
-    uvicorn.run(app, host=args.host, port=args.port)
+    if args.workers > 1:
+        # An import string is required to start several workers
+        uvicorn.run(
+            "node_server:app",
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            app_dir=os.path.dirname(os.path.abspath(__file__)),
+        )
+    else:
+        uvicorn.run(app, host=args.host, port=args.port)
 
 
 if __name__ == "__main__":
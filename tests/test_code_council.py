@@ -0,0 +1,98 @@
+"""Tests for the model-reply parsers in backend.code_council."""
+
+import asyncio
+
+import pytest
+
+from backend import code_council
+from backend.code_council import _parse_synthesis, _strip_code_fences, parse_structured_review
+
+# The same review in the header styles models produce; each must parse like
+# the plain one did before the parser was rewritten
+REVIEW_BODY = """{a}
+- Bugs: Off-by-one in the loop
+- Style: Fine
+- Overall Score: 6/10
+
+{b}
+- Bugs: Crashes on empty input
+- Overall Score: 3/10
+
+FINAL RANKING:
+1. Code Submission A
+2. Code Submission B
+"""
+
+HEADER_STYLES = {
+    "plain": ("Code Submission A:", "Code Submission B:"),
+    "numbered": ("1. Code Submission A:", "2. Code Submission B:"),
+    "bold": ("**Code Submission A:**", "### Code Submission B:"),
+    "numbered bold": ("1. **Code Submission A:**", "2) **Code Submission B:**"),
+}
+
+
+@pytest.mark.parametrize("style", HEADER_STYLES)
+def test_parse_structured_review_header_styles(style):
+    a, b = HEADER_STYLES[style]
+    parsed = parse_structured_review(REVIEW_BODY.format(a=a, b=b), ["A", "B"])
+
+    submissions = parsed["submissions"]
+    assert {label: sub["score"] for label, sub in submissions.items()} == {"A": 6, "B": 3}
+    assert submissions["A"]["categories"] == {"bugs": "Off-by-one in the loop", "style": "Fine"}
+    assert submissions["B"]["categories"] == {"bugs": "Crashes on empty input"}
+    assert parsed["ranking"] == ["A", "B"]
+
+
+def test_parse_structured_review_ignores_unknown_labels():
+    text = REVIEW_BODY.format(a="Code Submission A:", b="Code Submission B:")
+
+    parsed = parse_structured_review(text, ["A"])
+
+    assert list(parsed["submissions"]) == ["A"]
+
+
+@pytest.mark.parametrize("reply, code", [
+    ("x = 1", "x = 1"),
+    ("```\nx = 1\n```", "x = 1"),
+    ("  ```python\nx = 1\n```\n", "x = 1"),
+    # Fence lines are dropped wherever they are, as the old line-anchored regexes did
+    ("Here is the code:\n```python\nx = 1\n```", "Here is the code:\nx = 1"),
+    ("```js\na()\n```\nHope it helps.", "a()\nHope it helps."),
+])
+def test_strip_code_fences(reply, code):
+    assert _strip_code_fences(reply) == code
+
+
+def test_strip_code_fences_keeps_fence_with_info_string():
+    # Not a bare fence or a language tag, so it is left as content
+    assert _strip_code_fences("``` not a fence\nx = 1") == "``` not a fence\nx = 1"
+
+
+@pytest.mark.parametrize("reply", [
+    '{"code": "x = 1", "tests": "assert x == 1"}',
+    '```json\n{"code": "x = 1", "tests": "assert x == 1"}\n```',
+    'Here is the result:\n{"code": "x = 1", "tests": "assert x == 1"}',
+    'Sure:\n```json\n{"code": "```python\\nx = 1\\n```", "tests": "assert x == 1"}\n```\nDone.',
+    # Backends that ignore the requested format
+    "FINAL CODE:\n```python\nx = 1\n```\nFINAL TESTS:\n```python\nassert x == 1\n```",
+])
+def test_parse_synthesis(reply):
+    assert _parse_synthesis(reply) == ("x = 1", "assert x == 1")
+
+
+def test_parse_synthesis_unparseable():
+    assert _parse_synthesis("I could not combine these.") == ("", "")
+
+
+def test_synthesize_falls_back_to_best_submission(monkeypatch):
+    async def unparseable_reply(model, messages, query, response_format=None):
+        return {"content": "I could not combine these.", "node": "n1"}
+
+    monkeypatch.setattr(code_council, "cached_query", unparseable_reply)
+    submissions = [{"model": "m1", "code": "a = 1"}, {"model": "m2", "code": "b = 2"}]
+    reviews = [{"parsed_review": {"submissions": {"A": {"score": 4}, "B": {"score": 8}}}}]
+    tests = [{"model": "m1", "test_code": "assert a"}, {"model": "m2", "test_code": "assert b"}]
+
+    result = asyncio.run(code_council.synthesize_final_code(submissions, reviews, tests, "spec"))
+
+    assert (result["code"], result["tests"]) == ("b = 2", "assert a")
@@ -0,0 +1,229 @@
+"""Tests for request sharing, batching, retries and the circuit breaker in backend.distributed."""
+
+import asyncio
+import time
+from contextlib import aclosing
+
+import httpx
+import orjson
+import pytest
+
+from backend import distributed
+from backend.distributed import DistributedLLMClient, _BatchedChatError, _ChatBatcher
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+TIMEOUT = httpx.Timeout(5.0)
+
+
+@pytest.fixture(autouse=True)
+def no_retry_wait(monkeypatch):
+    monkeypatch.setattr(distributed, "RETRY_DELAY", 0.0)
+    monkeypatch.setattr(distributed, "BATCH_WINDOW_MS", 0)
+
+
+def _client_for(handler):
+    """A DistributedLLMClient whose every query goes to `handler` as node 'n1'."""
+    client = DistributedLLMClient()
+    http = httpx.AsyncClient(base_url="http://n1", transport=httpx.MockTransport(handler))
+    client._resolve_target = lambda model, node_url, messages=None: (http, "n1", None, None)
+    return client
+
+
+def test_rate_limited_node_does_not_open_breaker():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(429, headers={"Retry-After": "0"})
+
+    client = _client_for(handler)
+
+    assert asyncio.run(client.query_model("m", MESSAGES)) is None
+    assert len(calls) == distributed.MAX_RETRIES + 1
+    assert not client._circuit_open("n1")
+
+
+def test_breaker_opens_on_failures_and_closes_after_cooldown(monkeypatch):
+    monkeypatch.setattr(distributed, "CIRCUIT_BREAKER_COOLDOWN", 0.05)
+    client = _client_for(lambda request: httpx.Response(500))
+
+    assert asyncio.run(client.query_model("m", MESSAGES)) is None
+    assert distributed.MAX_RETRIES + 1 >= distributed.CIRCUIT_BREAKER_THRESHOLD
+    assert client._circuit_open("n1")
+
+    time.sleep(0.06)
+    assert not client._circuit_open("n1")
+
+
+def test_success_resets_breaker():
+    client = DistributedLLMClient()
+    for _ in range(distributed.CIRCUIT_BREAKER_THRESHOLD):
+        client._record_query_result("n1", succeeded=False)
+    assert client._circuit_open("n1")
+
+    client._record_query_result("n1", succeeded=True)
+
+    assert not client._circuit_open("n1")
+
+
+def test_retry_delay_honours_retry_after():
+    response = httpx.Response(429, headers={"Retry-After": "7"}, request=httpx.Request("POST", "http://n1/chat"))
+    error = httpx.HTTPStatusError("busy", request=response.request, response=response)
+
+    assert DistributedLLMClient._retry_delay(0, error) >= 7
+
+
+class _SlowUpstream:
+    """Stands in for _query_target, recording how each shared request ended."""
+
+    def __init__(self):
+        self.started = self.cancelled = self.finished = 0
+
+    async def __call__(self, target, model, messages, timeout, response_format):
+        self.started += 1
+        try:
+            await asyncio.sleep(0.05)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        self.finished += 1
+        return {"content": "reply", "node": "n1", "model": model}
+
+
+def _deduping_client():
+    client = DistributedLLMClient()
+    client._resolve_target = lambda model, node_url, messages=None: (None, "n1", None, None)
+    upstream = client._query_target = _SlowUpstream()
+    return client, upstream
+
+
+def test_cancelled_waiter_leaves_shared_request_running():
+    client, upstream = _deduping_client()
+
+    async def run():
+        first = asyncio.create_task(client.query_model("m", MESSAGES))
+        second = asyncio.create_task(client.query_model("m", MESSAGES))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run())["content"] == "reply"
+    assert (upstream.started, upstream.cancelled, upstream.finished) == (1, 0, 1)
+
+
+def test_last_waiter_cancelled_cancels_shared_request():
+    client, upstream = _deduping_client()
+
+    async def run():
+        waiter = asyncio.create_task(client.query_model("m", MESSAGES))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.sleep(0.1)
+
+    asyncio.run(run())
+
+    assert (upstream.started, upstream.cancelled, upstream.finished) == (1, 1, 0)
+    assert client._inflight == {}
+
+
+def test_streaming_fan_in_finishes_streams_when_caller_stops():
+    client = DistributedLLMClient()
+
+    async def stream_model(model, messages, timeout, node_url):
+        for i in range(10):
+            await asyncio.sleep(0.01)
+            yield {"content": str(i), "done": False, "node": "n1", "model": model}
+
+    client.stream_model = stream_model
+    configs = [{"model": "m1"}, {"model": "m2"}]
+
+    async def run():
+        async with aclosing(client.iter_models_streaming(configs, MESSAGES)) as chunks:
+            async for _ in chunks:
+                break
+        return [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+
+    assert asyncio.run(run()) == []
+
+
+def _reply(content):
+    return {"message": {"role": "assistant", "content": content}, "done": True}
+
+
+async def _submit_all(batcher, contents):
+    """Submit one chat per content concurrently; returns results or exceptions in order."""
+    return await asyncio.gather(
+        *(batcher.submit({"model": "m", "messages": [{"role": "user", "content": c}]}, TIMEOUT) for c in contents),
+        return_exceptions=True,
+    )
+
+
+def _batcher_for(handler):
+    http = httpx.AsyncClient(base_url="http://n1", transport=httpx.MockTransport(handler))
+    return _ChatBatcher(http, window=0.01, max_size=8)
+
+
+def test_batcher_coalesces_concurrent_requests():
+    paths = []
+
+    def handler(request):
+        paths.append(request.url.path)
+        requests = orjson.loads(request.content)["requests"]
+        return httpx.Response(200, json={"responses": [_reply(r["messages"][0]["content"]) for r in requests]})
+
+    results = asyncio.run(_submit_all(_batcher_for(handler), ["a", "b", "c"]))
+
+    assert paths == ["/chat/batch"]
+    assert [r["message"]["content"] for r in results] == ["a", "b", "c"]
+
+
+@pytest.mark.parametrize("status", [404, 405])
+def test_batcher_falls_back_without_batch_endpoint(status):
+    paths = []
+
+    def handler(request):
+        paths.append(request.url.path)
+        if request.url.path == "/chat/batch":
+            return httpx.Response(status)
+        return httpx.Response(200, json=_reply(orjson.loads(request.content)["messages"][0]["content"]))
+
+    batcher = _batcher_for(handler)
+
+    async def run():
+        first = await _submit_all(batcher, ["a", "b"])
+        second = await _submit_all(batcher, ["c", "d"])
+        return first + second
+
+    results = asyncio.run(run())
+
+    assert [r["message"]["content"] for r in results] == ["a", "b", "c", "d"]
+    # Only the first batch is tried; later ones go straight to /chat
+    assert paths == ["/chat/batch"] + ["/chat"] * 4
+
+
+def test_batcher_rejects_mismatched_response_count():
+    def handler(request):
+        return httpx.Response(200, json={"responses": [_reply("only one")]})
+
+    results = asyncio.run(_submit_all(_batcher_for(handler), ["a", "b"]))
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_batch_entry_errors_keep_their_status():
+    def handler(request):
+        return httpx.Response(200, json={"responses": [
+            {"error": "Chat failed: model 'm' not found", "status": 404},
+            {"error": "Chat failed: 429: Node is at capacity", "status": 429},
+            {"error": "Chat failed: connection refused"},
+        ]})
+
+    unknown_model, busy, old_node = asyncio.run(_submit_all(_batcher_for(handler), ["a", "b", "c"]))
+
+    assert isinstance(unknown_model, _BatchedChatError)
+    # Classified the same as the equivalent /chat replies
+    assert not DistributedLLMClient._is_retryable(unknown_model)
+    assert DistributedLLMClient._is_retryable(busy)
+    assert DistributedLLMClient._is_throttled(busy)
+    assert DistributedLLMClient._is_retryable(old_node)
+    assert not DistributedLLMClient._is_throttled(old_node)
@@ -0,0 +1,49 @@
+"""Tests for the conversation message log in backend.storage."""
+
+import pytest
+
+from backend import storage
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "DATA_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_append_after_interrupted_write():
+    storage.create_conversation("c1")
+    storage.add_user_message("c1", "first")
+
+    # Simulate a crash part-way through appending the next record
+    with open(storage._messages_path("c1"), "ab") as f:
+        f.write(b'{"role":"user","con')
+
+    assert [m["content"] for m in storage.get_conversation("c1")["messages"]] == ["first"]
+
+    storage.add_user_message("c1", "second")
+
+    conversation = storage.get_conversation("c1")
+    assert [m["content"] for m in conversation["messages"]] == ["first", "second"]
+    assert storage.get_conversation_metadata("c1")["message_count"] == 2
+
+
+def test_partial_first_record_is_dropped():
+    storage.create_conversation("c2")
+    with open(storage._messages_path("c2"), "ab") as f:
+        f.write(b'{"role":')
+
+    storage.add_user_message("c2", "only")
+
+    assert [m["content"] for m in storage.get_conversation("c2")["messages"]] == ["only"]
+
+
+def test_partial_record_longer_than_a_block():
+    storage.create_conversation("c3")
+    storage.add_user_message("c3", "first")
+    with open(storage._messages_path("c3"), "ab") as f:
+        f.write(b'{"content":"' + b"x" * 200_000)
+
+    storage.add_user_message("c3", "second")
+
+    assert [m["content"] for m in storage.get_conversation("c3")["messages"]] == ["first", "second"]